@@ -1,9 +1,28 @@
 from django.contrib import admin
-from .models import Teacher, Dept, DepartmentCourse, Schedule, Meeting 
+from .models import Teacher, Dept, DepartmentCourse, Schedule, Meeting, OutboxEmail
+from . import search
+
+
+class FullTextSearchMixin:
+    """
+    Add FTS index matches to the changelist's ``search_fields`` results.
+
+    The icontains filters still find substrings and fields the index does
+    not cover; the index adds matches that ignore accents ("jose" for José).
+    """
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        found, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        matching = search.matching(self.search_kind, search_term) if search_term else None
+        if matching is not None:
+            found = found | queryset.filter(pk__in=matching)
+        return found, may_have_duplicates
 
 
 @admin.register(Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = search.TEACHER
     list_display = ('username', 'first_name', 'last_name', 'department', 'teacher_id')
     search_fields = ('username', 'first_name', 'last_name', 'department', 'teacher_id')
 
@@ -15,7 +34,8 @@ class DeptAdmin(admin.ModelAdmin):
 
 
 @admin.register(DepartmentCourse)
-class DepartmentCourseAdmin(admin.ModelAdmin):
+class DepartmentCourseAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = search.COURSE
     list_display = ('dept', 'semester', 'course', 'teacher')
     list_filter = ('dept', 'semester')
     search_fields = ('course', 'teacher__first_name', 'teacher__last_name')
@@ -23,7 +43,8 @@ class DepartmentCourseAdmin(admin.ModelAdmin):
 
 
 @admin.register(Schedule)
-class ScheduleAdmin(admin.ModelAdmin):
+class ScheduleAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = search.SCHEDULE
     list_display = ('course', 'teacher', 'dept', 'day', 'start_time', 'end_time', 'room', 'date')
     list_filter = ('dept', 'teacher', 'day', 'room', 'date')
     search_fields = ('course', 'teacher__username', 'teacher__first_name', 'teacher__last_name', 'dept__name')
@@ -47,3 +68,11 @@ class LeaveRequestAdmin(admin.ModelAdmin):
     list_filter = ('status', 'date', 'teacher')
     search_fields = ('teacher__username', 'teacher__first_name', 'teacher__last_name')
     ordering = ('-date',)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient', 'subject')
+    ordering = ('-created_at',)
@@ -10,7 +10,18 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.handlers.asgi import ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'llms.settings')
+# Django does not support persistent connections under ASGI
+os.environ.setdefault('LMS_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+
+class AsyncViewsRequest(ASGIRequest):
+    # Route index, schedule and department_detail to home.async_views
+    urlconf = 'llms.asgi_urls'
+
+
+application.request_class = AsyncViewsRequest
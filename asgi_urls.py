@@ -0,0 +1,35 @@
+"""
+URL configuration used by asgi.py.
+
+The same routes as llms.urls, except that the pages with an async version
+in home.async_views are served by it.
+"""
+from django.urls import URLPattern, URLResolver
+
+from home import async_views
+from llms.urls import urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    'index': async_views.index,
+    'schedule': async_views.schedule,
+    'department_detail': async_views.department_detail,
+}
+
+
+def with_async_views(patterns):
+    routed = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            # Namespaced includes (the admin) have their own 'index'
+            if pattern.namespace is None:
+                pattern = URLResolver(
+                    pattern.pattern, with_async_views(pattern.url_patterns),
+                    pattern.default_kwargs, pattern.app_name,
+                )
+        elif pattern.name in ASYNC_VIEWS:
+            pattern = URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+        routed.append(pattern)
+    return routed
+
+
+urlpatterns = with_async_views(sync_urlpatterns)
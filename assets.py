@@ -0,0 +1,213 @@
+import gzip
+import json
+import mimetypes
+import re
+from io import BytesIO
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz files are written
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = features = None
+
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.map', '.xml', '.ico')
+RESIZABLE = ('.jpg', '.jpeg', '.png')
+COMPRESS_MIN_BYTES = 256
+IMAGE_VARIANT_MIN_BYTES = 20 * 1024
+IMAGE_WIDTHS = (480, 960, 1920)
+VARIANTS_MANIFEST = 'staticfiles-variants.json'
+
+# ManifestStaticFilesStorage puts a 12 character hash before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=60'
+# A .gz or .br file asked for by name is a download, not an encoded response
+ARCHIVE_TYPES = {'gzip': 'application/gzip', 'br': 'application/x-brotli'}
+
+
+def _image_formats():
+    if features is None:
+        return []
+    return [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Hashed static files plus, for every hashed file, precompressed .gz/.br
+    copies of text assets and resized WebP/AVIF variants of large images.
+
+    The variants are listed in VARIANTS_MANIFEST next to staticfiles.json,
+    keyed by the original name; see the static_variants template tags.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (tests, a fresh checkout) or no such file:
+            # link the plain name instead of failing the whole page
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        variants = {}
+        for name, hashed_name in sorted(self.hashed_files.items()):
+            suffix = Path(name).suffix.lower()
+            if suffix in COMPRESSIBLE:
+                for compressed in self._compress(hashed_name):
+                    yield name, compressed, True
+            elif suffix in RESIZABLE:
+                found = list(self._resize(hashed_name))
+                if found:
+                    variants[name] = found
+                for variant in found:
+                    yield name, variant['name'], True
+        self._replace(VARIANTS_MANIFEST, json.dumps(variants, indent=1).encode())
+
+    def _replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))
+
+    def _compress(self, name):
+        with self.open(name) as handle:
+            data = handle.read()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return
+        encoders = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            encoders.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+        for extension, encode in encoders:
+            compressed = encode(data)
+            # Not worth a Content-Encoding round trip for a few percent
+            if len(compressed) < len(data) * 0.95:
+                self._replace(name + extension, compressed)
+                yield name + extension
+
+    def _resize(self, name):
+        formats = _image_formats()
+        if not formats or self.size(name) < IMAGE_VARIANT_MIN_BYTES:
+            return
+        with self.open(name) as handle:
+            image = Image.open(BytesIO(handle.read()))
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if alpha else 'RGB')
+
+        stem = name.rsplit('.', 1)[0]
+        widths = sorted({w for w in IMAGE_WIDTHS if w < image.width} | {image.width})
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                out = BytesIO()
+                resized.save(out, fmt.upper(), quality=70 if fmt == 'avif' else 80)
+                variant = f'{stem}.{width}w.{fmt}'
+                self._replace(variant, out.getvalue())
+                yield {'name': variant, 'format': fmt, 'width': width, 'height': height}
+
+    def load_variants(self):
+        try:
+            with self.open(VARIANTS_MANIFEST) as handle:
+                return json.loads(handle.read())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT inside the application.
+
+    Hashed names never change content, so they are sent with a one-year
+    immutable Cache-Control; other files are revalidated after a minute.
+    Precompressed .br/.gz copies are sent when the client accepts them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = getattr(settings, 'STATIC_ROOT', None)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.is_static(request):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_static(request):
+            # Only static requests touch the disk in a worker thread
+            response = await sync_to_async(self.serve)(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def is_static(self, request):
+        return self.root and request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix)
+
+    def serve(self, request, name):
+        try:
+            path = Path(safe_join(self.root, name))
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if not path.is_file():
+            return None  # Let staticfiles (in DEBUG) or the URLconf answer
+
+        content_type, archive = mimetypes.guess_type(path.name)
+        if archive:
+            content_type = ARCHIVE_TYPES.get(archive, 'application/octet-stream')
+        content_type = content_type or 'application/octet-stream'
+        stat = path.stat()
+        immutable = bool(HASHED_NAME_RE.search(path.name))
+        if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        filename = path.name
+        compressible = path.suffix.lower() in COMPRESSIBLE
+        encoding = None
+        if compressible:
+            accepted = request.headers.get('Accept-Encoding', '')
+            for candidate, extension in (('br', '.br'), ('gzip', '.gz')):
+                if re.search(rf'\b{candidate}\b', accepted) and path.with_name(path.name + extension).is_file():
+                    encoding, path = candidate, path.with_name(path.name + extension)
+                    break
+
+        response = FileResponse(path.open('rb'), content_type=content_type, filename=filename)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if compressible:
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = IMMUTABLE if immutable else REVALIDATE
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        return response
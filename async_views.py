@@ -0,0 +1,91 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
+from django.shortcuts import redirect, render
+from django.utils.timezone import now
+
+from . import dashboard
+from .dashboard import _all
+from .models import LeaveRequest
+from .pagination import InvalidCursor, page_size_from, paginate_schedules
+from .roster import ROSTER_CACHE_TIMEOUT, department_roster, with_row_versions
+from .views import _events_dept_id, _visible_schedules
+
+
+# Async versions of the busiest pages, routed by asgi_urls.py under ASGI.
+# Querysets are evaluated before rendering: templates run in a worker
+# thread and must not hit the database from the event loop.
+
+_render = sync_to_async(render)
+
+
+@login_required
+async def index(request):
+    teacher = await request.auser()
+
+    if teacher.is_superuser:
+        messages.error(request, "Superusers are not allowed to log in.")
+        return redirect('login')
+
+    snapshot = await dashboard.ateacher_dashboard(teacher)
+
+    today_meeting = snapshot['today_meeting']
+    if today_meeting:
+        messages.info(
+            request,
+            f"You have a department meeting today at {today_meeting.venue} at {today_meeting.time}."
+        )
+
+    events_dept_id = await sync_to_async(_events_dept_id)(teacher)
+    return await _render(request, 'index.html', {'teacher': teacher, 'events_dept_id': events_dept_id, **snapshot})
+
+
+def _schedule_page(query, cursor, page_size):
+    """(page, next_cursor, is_first_page); a stale cursor starts again from the first page."""
+    schedules = _visible_schedules(query)
+    try:
+        return (*paginate_schedules(schedules, cursor=cursor, page_size=page_size), not cursor)
+    except InvalidCursor:
+        return (*paginate_schedules(schedules, page_size=page_size), True)
+
+
+@login_required
+async def schedule(request):
+    query = request.GET.get('q', '')
+
+    # Today's approved leave is a handful of rows, so it is fetched for
+    # everyone alongside the page instead of after it
+    page_size = page_size_from(request.GET.get('page_size'))
+    (page, next_cursor, is_first_page), on_leave = await asyncio.gather(
+        sync_to_async(_schedule_page)(query, request.GET.get('cursor'), page_size),
+        _all(LeaveRequest.objects.filter(date=now().date(), status='approved').values_list('teacher_id', flat=True)),
+    )
+
+    return await _render(request, 'schedule.html', {
+        'schedules': page,
+        'leave_today_teachers': set(on_leave),
+        'query': query,
+        'next_cursor': next_cursor,
+        'page_size': page_size,
+        'is_first_page': is_first_page,
+        'events_dept_id': await sync_to_async(_events_dept_id)(await request.auser()),
+    })
+
+
+@login_required
+async def department_detail(request, dept_name):
+    query = request.GET.get('q', '')
+
+    department_data = await sync_to_async(department_roster)(dept_name.upper(), query)
+    if department_data is None:
+        return HttpResponse("Department not found", status=404)
+
+    return await _render(request, 'department_detail.html', {
+        'department_data': await sync_to_async(with_row_versions)(department_data),
+        'dept_name': dept_name.upper(),
+        'query': query,
+        'fragment_timeout': ROSTER_CACHE_TIMEOUT,
+    })
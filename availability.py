@@ -0,0 +1,111 @@
+from datetime import date, time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import get_versions
+from .models import Meeting, Schedule
+from .occupancy import _minutes, _room_key, normalize_day
+
+
+# One bit per quantum: 15 minutes gives 96 bits per room per day
+QUANTUM_MINUTES = getattr(settings, 'ROOM_QUANTUM_MINUTES', 15)
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
+
+def interval_bits(start, end):
+    """Bitmask of the quanta touched by [start, end), both in minutes since midnight."""
+    first = start // QUANTUM_MINUTES
+    last = -(-end // QUANTUM_MINUTES)  # ceiling: a partly used quantum counts as busy
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def _weekly_bits():
+    """({room key: [bits per weekday]}, {room key: display name}) for weekly classes."""
+    weekly, names = {}, {}
+    rows = Schedule.objects.values_list('room', 'day', 'date', 'start_time', 'end_time')
+    for room, day, on_date, start_time, end_time in rows.iterator():
+        key = _room_key(room)
+        names.setdefault(key, room.strip())
+        days = weekly.setdefault(key, [0] * 7)
+        weekday = normalize_day(day)
+        # One-off classes only block their own date, see _dated_bits
+        if on_date is None and weekday is not None:
+            days[weekday] |= interval_bits(_minutes(start_time), _minutes(end_time))
+    # Rooms only ever used for meetings are still rooms
+    for venue in Meeting.objects.values_list('venue', flat=True).distinct().iterator():
+        key = _room_key(venue)
+        if key:
+            names.setdefault(key, venue.strip())
+            weekly.setdefault(key, [0] * 7)
+    return weekly, names
+
+
+def _dated_bits(on_date):
+    """{room key: bits} for one-off classes and meetings on ``on_date``."""
+    bits = {}
+    length = getattr(settings, 'MEETING_DURATION_MINUTES', 60)
+    for room, start_time, end_time in Schedule.objects.filter(date=on_date).values_list(
+        'room', 'start_time', 'end_time'
+    ):
+        key = _room_key(room)
+        bits[key] = bits.get(key, 0) | interval_bits(_minutes(start_time), _minutes(end_time))
+    for venue, at in Meeting.objects.filter(date=on_date).values_list('venue', 'time'):
+        key = _room_key(venue)
+        start = _minutes(at)
+        bits[key] = bits.get(key, 0) | interval_bits(start, start + length)
+    return bits
+
+
+def room_bitsets():
+    """Weekly room bitsets, rebuilt only after schedules or meetings change."""
+    versions = get_versions(['timetable', 'meetings'])
+    key = f"room-bits:{versions['timetable']}:{versions['meetings']}"
+    found = cache.get(key)
+    if found is None:
+        found = _weekly_bits()
+        cache.set(key, found, AVAILABILITY_CACHE_TIMEOUT)
+    return found
+
+
+def dated_bitsets(on_date):
+    versions = get_versions(['timetable', 'meetings'])
+    key = f"room-bits:{on_date.isoformat()}:{versions['timetable']}:{versions['meetings']}"
+    found = cache.get(key)
+    if found is None:
+        found = _dated_bits(on_date)
+        cache.set(key, found, AVAILABILITY_CACHE_TIMEOUT)
+    return found
+
+
+def free_rooms(start, end, weekday=None, on_date=None):
+    """
+    Names of rooms with nothing booked from ``start`` to ``end`` (times).
+
+    Pass ``on_date`` to also count that day's meetings and one-off classes;
+    with only ``weekday`` the weekly timetable alone is checked.
+    """
+    if on_date is not None:
+        weekday = on_date.weekday()
+    mask = interval_bits(_minutes(start), _minutes(end))
+    weekly, names = room_bitsets()
+    dated = dated_bitsets(on_date) if on_date is not None else {}
+    return sorted(
+        (names[key] for key, days in weekly.items() if not (days[weekday] | dated.get(key, 0)) & mask),
+        key=str.lower,
+    )
+
+
+def parse_window(params):
+    """(start, end, weekday, on_date) from request parameters; raises ValueError."""
+    start = time.fromisoformat(params.get('start', ''))
+    end = time.fromisoformat(params.get('end', ''))
+    if end <= start:
+        raise ValueError("end must be after start")
+    on_date = date.fromisoformat(params['date']) if params.get('date') else None
+    weekday = normalize_day(params.get('day')) if on_date is None else on_date.weekday()
+    if weekday is None:
+        raise ValueError("pass a date (YYYY-MM-DD) or a day (e.g. Sunday)")
+    return start, end, weekday, on_date
@@ -0,0 +1,56 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Versioned cache keys. Writers bump a scope's version instead of deleting
+# every key derived from it; readers build keys that include the version,
+# so stale entries are simply never read again and expire on their own.
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def _modified_key(scope):
+    return f'modified:{scope}'
+
+
+def get_version(scope):
+    # Seed from the clock so a version lost to eviction is never reused
+    return cache.get_or_set(_version_key(scope), lambda: time.time_ns() // 1000, timeout=None)
+
+
+def get_versions(scopes):
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    versions = {keys[key]: value for key, value in found.items()}
+    for scope in keys.values():
+        if scope not in versions:
+            versions[scope] = get_version(scope)
+    return versions
+
+
+def get_stamp(scope):
+    """(version, last-modified timestamp) of ``scope``, for conditional GETs."""
+    found = cache.get_many([_version_key(scope), _modified_key(scope)])
+    version = found.get(_version_key(scope)) or get_version(scope)
+    # A lost timestamp restarts at "now": clients refetch once, never miss a change
+    modified = found.get(_modified_key(scope)) or cache.get_or_set(_modified_key(scope), time.time, timeout=None)
+    return version, modified
+
+
+def bump_version(*scopes):
+    # Once committed: a reader in between would cache old rows under the new version
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    # A new clock value, not incr(): the file cache increments with a separate
+    # read and write, so two processes bumping at once could both write v+1
+    version, modified = time.time_ns() // 1000, time.time()
+    values = {}
+    for scope in scopes:
+        values[_version_key(scope)] = version
+        values[_modified_key(scope)] = modified
+    cache.set_many(values, timeout=None)
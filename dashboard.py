@@ -0,0 +1,70 @@
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from .caching import get_versions
+from .models import Meeting, Schedule
+from .roster import teacher_timetable_scope
+
+
+# Today's date is part of the key, so a snapshot never outlives its day
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def department_meetings_scope(department):
+    return f'meetings:{department}'
+
+
+def dashboard_key(teacher, today):
+    scopes = [teacher_timetable_scope(teacher.pk), department_meetings_scope(teacher.department)]
+    versions = get_versions(scopes)
+    return f'dashboard:{teacher.pk}:{today.isoformat()}:{versions[scopes[0]]}:{versions[scopes[1]]}'
+
+
+def _querysets(teacher, today):
+    schedules = Schedule.objects.filter(teacher=teacher)
+    upcoming_meetings = Meeting.objects.filter(
+        created_by__department=teacher.department,
+        date__gte=today,
+    ).order_by('date', 'time')
+    return schedules, schedules.values_list('course', flat=True).distinct(), upcoming_meetings
+
+
+def _snapshot(schedules, courses, upcoming_meetings, today):
+    return {
+        'schedules': schedules,
+        'courses': courses,
+        'upcoming_meetings': upcoming_meetings,
+        # Upcoming meetings are ordered by date, so today's come first
+        'today_meeting': next((m for m in upcoming_meetings if m.date == today), None),
+    }
+
+
+def teacher_dashboard(teacher):
+    """Schedules, courses and department meetings for the index page, cached per teacher."""
+    today = now().date()
+    key = dashboard_key(teacher, today)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        schedules, courses, upcoming_meetings = _querysets(teacher, today)
+        snapshot = _snapshot(list(schedules), list(courses), list(upcoming_meetings), today)
+        cache.set(key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+async def _all(queryset):
+    return [row async for row in queryset]
+
+
+async def ateacher_dashboard(teacher):
+    """teacher_dashboard for async views; on a miss the queries run together."""
+    today = now().date()
+    key = dashboard_key(teacher, today)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        results = await asyncio.gather(*map(_all, _querysets(teacher, today)))
+        snapshot = _snapshot(*results, today)
+        await cache.aset(key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
@@ -0,0 +1,130 @@
+import asyncio
+import itertools
+import json
+import secrets
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+
+# Events kept per department so a reconnecting client (Last-Event-ID) misses nothing
+EVENT_HISTORY = getattr(settings, 'EVENTS_HISTORY', 100)
+# Messages a slow client may fall behind by before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+
+
+def format_event(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class Broker:
+    """
+    In-process fan-out of department events to SSE subscribers.
+
+    Each connection is an asyncio.Queue on its own event loop, so an idle
+    client costs one queue and a parked coroutine. publish() may be called
+    from any thread (signal handlers run in request threads) and hands the
+    message to each subscriber's loop with call_soon_threadsafe.
+
+    Only clients connected to this process are reached, and only changes
+    saved by this process are published. The stream therefore works when
+    the whole site, writers included, runs as one ASGI process; with more
+    workers, publish through a shared broker (e.g. Redis pub/sub) instead.
+
+    Event ids are ``<epoch>-<n>`` with an epoch chosen per broker, so an id
+    from before a restart is never mistaken for one issued since.
+    """
+
+    def __init__(self, history=EVENT_HISTORY):
+        self._lock = threading.Lock()
+        self.epoch = secrets.token_hex(4)
+        self._ids = itertools.count(1)
+        self._subscribers = defaultdict(set)
+        self._history = defaultdict(lambda: deque(maxlen=history))
+
+    def subscribe(self, department, last_event_id=None):
+        """
+        A (subscriber, backlog) pair; backlog holds the events after ``last_event_id``.
+
+        An id this broker did not issue (the client last connected before a
+        restart) gets every event still in the history.
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[department].add(subscriber)
+            if last_event_id is None:
+                backlog = []
+            else:
+                after = self._sequence(last_event_id)
+                backlog = [message for n, message in self._history[department] if n > after]
+        return subscriber, backlog
+
+    def _sequence(self, event_id):
+        epoch, _, n = event_id.partition('-')
+        return int(n) if epoch == self.epoch and n.isdigit() else 0
+
+    def unsubscribe(self, department, subscriber):
+        with self._lock:
+            self._subscribers[department].discard(subscriber)
+            if not self._subscribers[department]:
+                del self._subscribers[department]
+
+    def publish(self, department, event, data):
+        with self._lock:
+            n = next(self._ids)
+            event_id = f'{self.epoch}-{n}'
+            message = format_event(event_id, event, data)
+            self._history[department].append((n, message))
+            subscribers = list(self._subscribers.get(department, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:  # The client's loop has already closed
+                pass
+        return event_id
+
+    @staticmethod
+    def _deliver(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: end the stream; the browser reconnects and
+            # catches up from the history
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def subscriber_count(self, department=None):
+        with self._lock:
+            if department is not None:
+                return len(self._subscribers.get(department, ()))
+            return sum(map(len, self._subscribers.values()))
+
+
+broker = Broker()
+
+
+async def stream(department, last_event_id=None):
+    """Server-sent event chunks for ``department`` until the client goes away."""
+    subscriber, backlog = broker.subscribe(department, last_event_id)
+    _, queue = subscriber
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        for message in backlog:
+            yield message
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        broker.unsubscribe(department, subscriber)
@@ -15,7 +15,8 @@ class TeacherSignupForm(forms.ModelForm):
 
     class Meta:
         model = Teacher
-        fields = ['username', 'email', 'first_name', 'last_name', 'department', 'teacher_id', 'password']
+        # teacher_id is allocated by TeacherIdSequence, not chosen at signup
+        fields = ['username', 'email', 'first_name', 'last_name', 'department', 'password']
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['username'].help_text = None 
@@ -0,0 +1,248 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import Signer
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.timezone import now
+
+from .caching import get_versions
+from .models import Dept, LeaveRequest, Meeting, Schedule, Teacher
+from .occupancy import normalize_day
+
+
+FEED_KINDS = ('teacher', 'dept')
+# Feeds change whenever any of these do; each is bumped by signals
+FEED_SCOPES = ('timetable', 'meetings', 'leave')
+ICAL_CACHE_TIMEOUT = getattr(settings, 'ICAL_CACHE_TIMEOUT', 60 * 60 * 24)
+# Weekly classes start this far back, so recent weeks still show up; purge
+# keeps approved leave this old so its EXDATEs stay in the feed
+HISTORY_DAYS = 28
+# Daylight-saving changes listed in the VTIMEZONE; clients carry the last one on
+VTIMEZONE_YEARS = 5
+
+BYDAY = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+_signer = Signer(salt='home.ical')
+
+
+def feed_signature(kind, key):
+    # Calendar apps cannot log in, so the URL itself is the credential
+    return _signer.signature(f'{kind}:{key}')
+
+
+def valid_signature(kind, key, signature):
+    return kind in FEED_KINDS and constant_time_compare(feed_signature(kind, key), signature)
+
+
+def feed_url(kind, key):
+    return reverse('calendar_feed', args=[kind, key, feed_signature(kind, key)])
+
+
+def feed_etag(kind, key):
+    """Derived from cached version numbers only, so it costs no queries."""
+    versions = get_versions(FEED_SCOPES)
+    raw = ':'.join([kind, str(key)] + [str(versions[scope]) for scope in FEED_SCOPES])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _cache_key(kind, key, etag):
+    return f'ical:{kind}:{key}:{etag}'
+
+
+def _escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    # RFC 5545: lines longer than 75 octets continue on lines starting with a space
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:  # never split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _local(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _offset(delta):
+    minutes = int(delta.total_seconds()) // 60
+    return f"{'-' if minutes < 0 else '+'}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+def _observance(zone, at, offset_from):
+    kind = 'DAYLIGHT' if at.astimezone(zone).dst() else 'STANDARD'
+    return [
+        f'BEGIN:{kind}',
+        # Local time of the change, on the clock in use before it
+        f'DTSTART:{_local((at + offset_from).replace(tzinfo=None))}',
+        f'TZOFFSETFROM:{_offset(offset_from)}',
+        f'TZOFFSETTO:{_offset(at.astimezone(zone).utcoffset())}',
+        f'TZNAME:{_escape(at.astimezone(zone).tzname())}',
+        f'END:{kind}',
+    ]
+
+
+@lru_cache(maxsize=8)
+def _vtimezone(tzid, first_year):
+    """
+    VTIMEZONE for ``tzid``, which RFC 5545 requires for every TZID a feed uses.
+
+    Lists each UTC offset change zoneinfo has from ``first_year`` on, found
+    day by day and then narrowed to the minute.
+    """
+    zone = ZoneInfo(tzid)
+
+    def offset(at):
+        return at.astimezone(zone).utcoffset()
+
+    at = datetime(first_year, 1, 1, tzinfo=dt_timezone.utc)
+    end = datetime(first_year + VTIMEZONE_YEARS, 1, 1, tzinfo=dt_timezone.utc)
+    lines = ['BEGIN:VTIMEZONE', f'TZID:{tzid}'] + _observance(zone, at, offset(at))
+    while at < end:
+        if offset(at) != offset(at + timedelta(days=1)):
+            lo, hi = 0, 24 * 60  # minutes into the day
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                lo, hi = (mid, hi) if offset(at + timedelta(minutes=mid)) == offset(at) else (lo, mid)
+            lines += _observance(zone, at + timedelta(minutes=hi), offset(at))
+        at += timedelta(days=1)
+    lines.append('END:VTIMEZONE')
+    return lines
+
+
+def _schedule_event(schedule, leave_dates, first_day, stamp, tzid):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:schedule-{schedule.pk}@lms',
+        f'DTSTAMP:{stamp}',
+        f'SUMMARY:{_escape(schedule.course)}',
+        f'LOCATION:{_escape(schedule.room)}',
+    ]
+    if schedule.teacher:
+        lines.append(f'DESCRIPTION:{_escape(schedule.teacher.get_full_name() or schedule.teacher.username)}')
+
+    if schedule.date:
+        start = datetime.combine(schedule.date, schedule.start_time)
+        end = datetime.combine(schedule.date, schedule.end_time)
+        lines += [f'DTSTART;TZID={tzid}:{_local(start)}', f'DTEND;TZID={tzid}:{_local(end)}']
+        # Kept with its UID so calendars that already show the class cancel it
+        if schedule.date in leave_dates:
+            lines.append('STATUS:CANCELLED')
+    else:
+        weekday = normalize_day(schedule.day)
+        if weekday is None:
+            return []
+        day = first_day + timedelta(days=(weekday - first_day.weekday()) % 7)
+        start = datetime.combine(day, schedule.start_time)
+        end = datetime.combine(day, schedule.end_time)
+        lines += [
+            f'DTSTART;TZID={tzid}:{_local(start)}',
+            f'DTEND;TZID={tzid}:{_local(end)}',
+            f'RRULE:FREQ=WEEKLY;BYDAY={BYDAY[weekday]}',
+        ]
+        # Approved leave cancels that week's class
+        skipped = sorted(d for d in leave_dates if d.weekday() == weekday and d >= day)
+        if skipped:
+            exdates = ','.join(_local(datetime.combine(d, schedule.start_time)) for d in skipped)
+            lines.append(f'EXDATE;TZID={tzid}:{exdates}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def _meeting_event(meeting, stamp, tzid):
+    start = datetime.combine(meeting.date, meeting.time)
+    minutes = getattr(settings, 'MEETING_DURATION_MINUTES', 60)
+    return [
+        'BEGIN:VEVENT',
+        f'UID:meeting-{meeting.pk}@lms',
+        f'DTSTAMP:{stamp}',
+        'SUMMARY:Department meeting',
+        f'LOCATION:{_escape(meeting.venue)}',
+        f'DTSTART;TZID={tzid}:{_local(start)}',
+        f'DTEND;TZID={tzid}:{_local(start + timedelta(minutes=minutes))}',
+        'END:VEVENT',
+    ]
+
+
+def feed_source(kind, key):
+    """(calendar name, schedules, meetings) for a feed, or None if ``key`` is unknown."""
+    schedules = Schedule.objects.select_related('teacher').order_by('day', 'start_time', 'id')
+    if kind == 'teacher':
+        if not key.isdigit():
+            return None
+        teacher = Teacher.objects.filter(pk=key, is_superuser=False).only(
+            'username', 'first_name', 'last_name', 'department'
+        ).first()
+        if teacher is None:
+            return None
+        name = teacher.get_full_name() or teacher.username
+        department = teacher.department
+        schedules = schedules.filter(teacher=teacher)
+    else:
+        if not Dept.objects.filter(name=key).exists():
+            return None
+        name = department = key
+        schedules = schedules.filter(dept__name=key)
+    meetings = Meeting.objects.filter(created_by__department=department).order_by('date', 'time')
+    return name, schedules, meetings
+
+
+def generate_feed(name, schedules, meetings):
+    """Yield the calendar one event at a time; rows are read with iterator()."""
+    tzid = settings.TIME_ZONE
+    stamp = now().strftime('%Y%m%dT%H%M%SZ')
+    first_day = now().date() - timedelta(days=HISTORY_DAYS)
+
+    yield ''.join(map(_fold, [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//LMS//Timetable//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(name)}',
+        *_vtimezone(tzid, first_day.year),
+    ]))
+
+    leave = {}
+    for teacher_id, day in LeaveRequest.objects.filter(
+        status='approved', date__gte=first_day, teacher__in=schedules.values('teacher'),
+    ).values_list('teacher_id', 'date'):
+        leave.setdefault(teacher_id, set()).add(day)
+
+    for schedule in schedules.iterator():
+        lines = _schedule_event(schedule, leave.get(schedule.teacher_id, ()), first_day, stamp, tzid)
+        yield ''.join(map(_fold, lines))
+    for meeting in meetings.iterator():
+        yield ''.join(map(_fold, _meeting_event(meeting, stamp, tzid)))
+    yield _fold('END:VCALENDAR')
+
+
+def cached_feed(kind, key, etag):
+    return cache.get(_cache_key(kind, key, etag))
+
+
+def caching_stream(kind, key, etag, chunks):
+    """Pass ``chunks`` through and cache the whole feed once it is complete."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    # Versions are bumped once a change commits and ``etag`` was read before
+    # any rows, so the feed is at least as new as it. If a change committed
+    # meanwhile the etag is already stale and nobody would read this copy.
+    if feed_etag(kind, key) == etag:
+        cache.set(_cache_key(kind, key, etag), ''.join(parts), ICAL_CACHE_TIMEOUT)
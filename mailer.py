@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail, Teacher
+
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE = 60  # seconds; doubles after every failed attempt
+OUTBOX_LEASE = 300  # seconds a claimed message is hidden from other workers
+
+
+def queue_meeting_notice(meeting):
+    """Queue one notice per teacher in the organiser's department."""
+    teacher = meeting.created_by
+    recipients = Teacher.objects.filter(
+        department=teacher.department, is_superuser=False
+    ).exclude(email='').values_list('email', flat=True)
+
+    subject = f"Department Meeting Scheduled on {meeting.date}"
+    message = (
+        f"Dear Lecturer,\n\n"
+        f"A department meeting has been scheduled.\n\n"
+        f"📅 Date: {meeting.date}\n"
+        f"🕒 Time: {meeting.time}\n"
+        f"📍 Venue: {meeting.venue}\n"
+        f"👤 Scheduled by: {teacher.get_full_name() or teacher.username}\n\n"
+        f"Please be punctual.\n\nRegards,\nAdmin"
+    )
+    OutboxEmail.objects.bulk_create([
+        OutboxEmail(subject=subject, body=message, recipient=email)
+        for email in recipients
+    ])
+
+
+def _claim(batch_size):
+    """
+    Due messages that this worker now owns.
+
+    Claimed rows have next_attempt_at pushed past the lease, so other workers
+    skip them until it runs out. The UPDATE only takes rows that are still
+    due: if another worker claimed any of them between our read and write,
+    the rowcount comes up short, so we roll back and read again.
+    """
+    while True:
+        now = timezone.now()
+        due = OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        with transaction.atomic():
+            if transaction.get_connection().features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            claimed = list(due[:batch_size])
+            lease = now + timedelta(seconds=OUTBOX_LEASE)
+            taken = OutboxEmail.objects.filter(
+                pk__in=[m.pk for m in claimed], status='pending', next_attempt_at__lte=now,
+            ).update(next_attempt_at=lease)
+            if taken == len(claimed):
+                for item in claimed:
+                    item.next_attempt_at = lease
+                return claimed
+            transaction.set_rollback(True)
+
+
+def _record_failure(item, error, max_attempts, retry_base):
+    item.attempts += 1
+    item.last_error = str(error)
+    if item.attempts >= max_attempts:
+        item.status = 'failed'
+    else:
+        delay = retry_base * 2 ** (item.attempts - 1)
+        item.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    item.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def deliver_pending(batch_size=OUTBOX_BATCH_SIZE, rate=None, max_attempts=OUTBOX_MAX_ATTEMPTS,
+                    retry_base=OUTBOX_RETRY_BASE, connection=None):
+    """
+    Send one batch of due messages over a single mail connection.
+
+    ``rate`` caps messages per second. Failed messages are retried with
+    exponential backoff and marked failed after ``max_attempts``.
+    Returns a (sent, failed) tuple.
+    """
+    batch = _claim(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # Server unreachable: the whole batch goes back with a backoff
+        for item in batch:
+            _record_failure(item, exc, max_attempts, retry_base)
+        return 0, len(batch)
+
+    sent = failed = 0
+    interval = 1.0 / rate if rate else 0
+    try:
+        for item in batch:
+            started = time.monotonic()
+            message = EmailMessage(
+                item.subject, item.body, item.from_email or None, [item.recipient],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                _record_failure(item, exc, max_attempts, retry_base)
+                failed += 1
+            else:
+                item.status = 'sent'
+                item.attempts += 1
+                item.sent_at = timezone.now()
+                item.save(update_fields=['status', 'attempts', 'sent_at'])
+                sent += 1
+            if interval:
+                time.sleep(max(0, interval - (time.monotonic() - started)))
+    finally:
+        connection.close()
+    return sent, failed
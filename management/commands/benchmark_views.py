@@ -0,0 +1,170 @@
+import json
+import statistics
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from home.models import Dept, LeaveRequest, Meeting, Schedule, Teacher
+
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def data_volumes():
+    return {
+        'teachers': Teacher.objects.filter(is_superuser=False).count(),
+        'schedules': Schedule.objects.count(),
+        'meetings': Meeting.objects.count(),
+        'leave_requests': LeaveRequest.objects.count(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Time index, schedule, department_detail, teacher_list and create_meeting through the "
+        "test client and compare p50/p95 latency, query counts and peak memory with a stored "
+        "baseline. Seed data first with seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per view.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per view first.")
+        parser.add_argument('--user', help="Username to log in as; defaults to a teacher with schedules.")
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file.")
+        parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baseline.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed relative slowdown or memory growth before a view is flagged.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error if any view regressed against the baseline.")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+
+        teacher = self._teacher(options['user'])
+        client = Client()
+        client.force_login(teacher)
+
+        results = {}
+        # The test client always sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, url in self._targets():
+                results[name] = self._measure(client, url, options['repeat'], options['warmup'])
+
+        volumes = data_volumes()
+        self._report(results)
+
+        path = Path(options['baseline'])
+        if options['save_baseline']:
+            path.write_text(json.dumps({'volumes': volumes, 'results': results}, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {path}."))
+            return
+        if not path.exists():
+            self.stdout.write(f"No baseline at {path}; run with --save-baseline to create one.")
+            return
+
+        baseline = json.loads(path.read_text())
+        if baseline.get('volumes') != volumes:
+            self.stderr.write(self.style.WARNING(
+                f"Data volumes differ from the baseline ({baseline.get('volumes')} vs {volumes}); "
+                "the comparison may not be meaningful."
+            ))
+        regressions = self._compare(results, baseline.get('results', {}), options['tolerance'])
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} view(s) regressed: {', '.join(regressions)}")
+
+    def _teacher(self, username):
+        if username:
+            try:
+                return Teacher.objects.get(username=username)
+            except Teacher.DoesNotExist:
+                raise CommandError(f"No such user: {username}")
+        # index turns superusers away, so benchmark as an ordinary teacher
+        teacher = Teacher.objects.filter(is_superuser=False, schedules__isnull=False).order_by('id').first()
+        if teacher is None:
+            raise CommandError("No teacher with schedules; run seed_data first or pass --user.")
+        return teacher
+
+    def _targets(self):
+        yield 'index', reverse('index')
+        yield 'schedule', reverse('schedule')
+        for dept in Dept.objects.order_by('name'):
+            yield f'department_detail:{dept.name.lower()}', reverse('department_detail', args=[dept.name.lower()])
+        yield 'teacher_list', reverse('teacher_list')
+        yield 'week', reverse('my_week')
+        yield 'create_meeting', reverse('create_meeting')
+
+    def _get(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+        return response
+
+    def _measure(self, client, url, repeat, warmup):
+        for _ in range(warmup):
+            self._get(client, url)
+
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            self._get(client, url)
+            timings.append((perf_counter() - started) * 1000)
+
+        # tracemalloc slows every allocation down, so queries and memory come
+        # from one extra request outside the timed loop
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                self._get(client, url)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'queries': len(captured.captured_queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def _report(self, results):
+        self.stdout.write(f"{'view':<28} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KiB':>10}")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<28} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['queries']:>8} {r['peak_kib']:>10.1f}"
+            )
+
+    def _compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, r in results.items():
+            old = baseline.get(name)
+            if old is None:
+                self.stdout.write(f"{name}: not in baseline")
+                continue
+            problems = []
+            if r['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+                problems.append(f"p95 {old['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+            if r['queries'] > old['queries']:
+                problems.append(f"queries {old['queries']} -> {r['queries']}")
+            if r['peak_kib'] > old['peak_kib'] * (1 + tolerance):
+                problems.append(f"peak {old['peak_kib']:.1f} -> {r['peak_kib']:.1f} KiB")
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: " + '; '.join(problems)))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+        return regressions
@@ -0,0 +1,26 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from home.models import Teacher
+from home.thumbnails import THUMBNAIL_SIZES, generate_thumbnails, thumbnail_name
+
+
+class Command(BaseCommand):
+    help = "Write WebP profile picture thumbnails for pictures uploaded before they were generated automatically."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate thumbnails that already exist.")
+
+    def handle(self, *args, **options):
+        made = 0
+        names = Teacher.objects.exclude(profile_picture='').exclude(profile_picture=None).values_list(
+            'profile_picture', flat=True
+        )
+        for name in names.iterator():
+            if not options['force'] and all(
+                default_storage.exists(thumbnail_name(name, size)) for size in THUMBNAIL_SIZES
+            ):
+                continue
+            generate_thumbnails(name)
+            made += 1
+        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails for {made} picture(s)."))
@@ -0,0 +1,236 @@
+import csv
+import json
+from datetime import date, time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from home import search, timetable
+from home.caching import bump_version
+from home.models import Dept, DepartmentCourse, Schedule, Teacher
+from home.occupancy import OccupancyIndex
+from home.roster import invalidate_rosters, invalidate_teacher_rows
+
+
+SCHEDULE_FIELDS = ('course', 'teacher', 'dept', 'day', 'date', 'start_time', 'end_time', 'room')
+COURSE_FIELDS = ('dept', 'semester', 'course', 'teacher')
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path, fmt):
+    """Yield (line number, dict) pairs without loading the whole file."""
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        if fmt == 'csv':
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, {k.strip(): (v or '').strip() for k, v in row.items() if k}
+        else:
+            for line_no, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield line_no, RowError(f"invalid JSON: {exc}")
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, RowError("expected a JSON object")
+                    continue
+                yield line_no, {k: '' if v is None else str(v).strip() for k, v in row.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or JSONL timetable into Schedule or DepartmentCourse rows. "
+        "Rows are validated one by one, checked for room and teacher clashes, and "
+        "written with bulk_create in batches; bad rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--kind', choices=('schedule', 'course'), default='schedule',
+                            help="schedule: %s; course: %s" % (', '.join(SCHEDULE_FIELDS), ', '.join(COURSE_FIELDS)))
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; write nothing.")
+
+    def handle(self, path, **options):
+        fmt = options['format'] or ('jsonl' if Path(path).suffix.lower() in ('.jsonl', '.ndjson') else 'csv')
+        if not Path(path).is_file():
+            raise CommandError(f"No such file: {path}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        self.kind = options['kind']
+        self.dry_run = options['dry_run']
+        self.created = self.errors = 0
+        self._load_lookups()
+
+        build = self._build_schedule if self.kind == 'schedule' else self._build_course
+        batch = []
+        for line_no, row in read_rows(path, fmt):
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                batch.append((line_no, build(row)))
+            except RowError as exc:
+                self._report(line_no, exc)
+            if len(batch) >= options['batch_size']:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+
+        verb = "Validated" if self.dry_run else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {self.created} row(s); {self.errors} error(s)."))
+
+    def _load_lookups(self):
+        # One query each; every row is then resolved from memory
+        self.depts = {d.name.upper(): d for d in Dept.objects.all()}
+        self.teachers = {}
+        for t in Teacher.objects.filter(is_superuser=False).only('id', 'username', 'first_name', 'last_name', 'teacher_id'):
+            self.teachers[t.username.lower()] = t
+            if t.teacher_id:
+                self.teachers.setdefault(t.teacher_id, t)
+
+        self.occupancy = OccupancyIndex()
+        if self.kind == 'schedule':
+            # Same rule as DepartmentCourse.match: earliest semester wins
+            self.courses = {}
+            for dc in DepartmentCourse.objects.order_by('-semester').only('id', 'dept_id', 'course'):
+                self.courses[(dc.dept_id, dc.course.strip().lower())] = dc
+            for s in Schedule.objects.only('id', 'course', 'teacher_id', 'day', 'date', 'start_time', 'end_time', 'room'):
+                self.occupancy.add(s)
+
+    def _report(self, line_no, error):
+        self.errors += 1
+        self.stderr.write(f"line {line_no}: {error}")
+
+    def _dept(self, row, required=True):
+        name = row.get('dept', '').upper()
+        if not name:
+            if required:
+                raise RowError("dept is required")
+            return None
+        if name not in self.depts:
+            raise RowError(f"unknown dept {name!r}")
+        return self.depts[name]
+
+    def _teacher(self, row):
+        ref = row.get('teacher', '')
+        if not ref:
+            return None
+        teacher = self.teachers.get(ref.lower()) or self.teachers.get(ref)
+        if teacher is None:
+            raise RowError(f"unknown teacher {ref!r}")
+        return teacher
+
+    @staticmethod
+    def _required(row, field):
+        value = row.get(field, '')
+        if not value:
+            raise RowError(f"{field} is required")
+        return value
+
+    def _build_schedule(self, row):
+        course = self._required(row, 'course')
+        day = self._required(row, 'day')
+        room = self._required(row, 'room')
+        try:
+            start = time.fromisoformat(self._required(row, 'start_time'))
+            end = time.fromisoformat(self._required(row, 'end_time'))
+            on_date = date.fromisoformat(row['date']) if row.get('date') else None
+        except ValueError as exc:
+            raise RowError(str(exc))
+        if end <= start:
+            raise RowError("end_time must be after start_time")
+        if len(course) > 100 or len(day) > 20 or len(room) > 50:
+            raise RowError("course, day or room is too long")
+        dept = self._dept(row, required=False)
+        schedule = Schedule(
+            course=course, teacher=self._teacher(row), dept=dept,
+            department_course=self.courses.get((dept.id, course.lower())) if dept else None,
+            day=day, date=on_date, start_time=start, end_time=end, room=room,
+        )
+        # Checked against existing rows and everything accepted so far
+        conflicts = self.occupancy.conflicts(schedule)
+        if conflicts:
+            raise RowError(' '.join(conflicts))
+        self.occupancy.add(schedule)
+        return schedule
+
+    def _build_course(self, row):
+        course = self._required(row, 'course')
+        try:
+            semester = int(self._required(row, 'semester'))
+        except ValueError:
+            raise RowError("semester must be a whole number")
+        if semester < 1 or len(course) > 100:
+            raise RowError("semester must be positive and course at most 100 characters")
+        return DepartmentCourse(dept=self._dept(row), semester=semester, course=course, teacher=self._teacher(row))
+
+    def _write(self, objs):
+        # bulk_create sends no signals, so sync the search index, roster
+        # caches, week grid and timetable stamp here
+        if self.kind == 'schedule':
+            Schedule.objects.bulk_create(objs)
+            search.index_schedules(objs)
+            timetable.materialize(objs)
+            invalidate_teacher_rows({obj.teacher_id for obj in objs})
+        else:
+            DepartmentCourse.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=['dept', 'semester', 'course'],
+                update_fields=['teacher'],
+            )
+            search.index_courses(objs)
+            # Relink schedules by these names, as the link_schedules signal would
+            for dept_id, name in {(obj.dept_id, obj.course) for obj in objs}:
+                invalidate_teacher_rows(DepartmentCourse.relink(dept_id, name))
+        invalidate_rosters({obj.dept_id for obj in objs})
+        if self.kind == 'schedule':
+            bump_version('timetable')
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        if self.kind == 'course':
+            # An upsert may touch each key only once per statement: last row wins
+            latest = {}
+            for line_no, obj in batch:
+                latest[(obj.dept_id, obj.semester, obj.course)] = (line_no, obj)
+            batch = list(latest.values())
+        if self.dry_run:
+            self.created += len(batch)
+            return
+
+        try:
+            with transaction.atomic():
+                self._write([obj for _, obj in batch])
+            self.created += len(batch)
+        except DatabaseError:
+            # Find the offending rows one at a time so the rest still load
+            for line_no, obj in batch:
+                self._unsave(obj)
+                try:
+                    with transaction.atomic():
+                        self._write([obj])
+                    self.created += 1
+                except DatabaseError as exc:
+                    self._unsave(obj)
+                    if self.kind == 'schedule':
+                        # Never written, so it must not clash with later rows
+                        self.occupancy.remove(obj)
+                    self._report(line_no, exc)
+
+    @staticmethod
+    def _unsave(obj):
+        # bulk_create set these before the rollback undid the insert
+        obj.pk = None
+        obj._state.adding = True
+        obj._state.db = None
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from home.purge import PURGE_BATCH_SIZE, purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete past meetings and leave requests in bounded batches. "
+        "Run it from cron, or pass --every to keep it running as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE,
+                            help="Rows deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to sleep between batches.")
+        parser.add_argument('--every', type=int, default=0,
+                            help="Repeat every N seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            counts = purge_expired(batch_size=options['batch_size'], pause=options['pause'])
+            self.stdout.write(
+                f"Purged {counts['meetings']} meeting(s) and {counts['leave_requests']} leave request(s)."
+            )
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(max(0, options['every'] - (time.monotonic() - started)))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for teachers, schedules and department courses."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write("Full-text search needs SQLite FTS5; nothing to rebuild.")
+            return
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
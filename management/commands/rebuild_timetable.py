@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from home import timetable
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the materialized weekly timetable grid from every schedule. Needed after "
+        "changing TIMETABLE_SLOT_MINUTES or editing schedules with queryset.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Grid cells inserted per query.")
+
+    def handle(self, *args, **options):
+        written = timetable.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Timetable grid rebuilt with {written} cell(s)."))
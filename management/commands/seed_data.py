@@ -0,0 +1,189 @@
+import random
+from datetime import time, timedelta
+from math import ceil
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.timezone import now
+
+from home import search, timetable
+from home.caching import bump_version
+from home.models import Dept, DepartmentCourse, LeaveRequest, Meeting, Schedule, Teacher, assign_teacher_ids
+from home.roster import invalidate_rosters, invalidate_teacher_rows
+
+
+SEED_PREFIX = 'seed-'
+
+# Row counts at --scale 1
+TEACHERS = 2000
+SCHEDULES = 20000
+MEETINGS = 5000
+LEAVE_REQUESTS = 10000
+
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+HOURS = range(7, 15)
+SEMESTERS = range(1, 9)
+COURSES_PER_SEMESTER = 6
+
+FIRST_NAMES = ['Aarav', 'Anisha', 'Bikash', 'Deepa', 'Gita', 'Hari', 'Kiran', 'Laxmi', 'Manish', 'Nabin',
+               'Pooja', 'Prakash', 'Rita', 'Sagar', 'Sita', 'Suman', 'Sunita', 'Umesh']
+LAST_NAMES = ['Adhikari', 'Bhandari', 'Gurung', 'Karki', 'Khadka', 'Magar', 'Poudel', 'Rai', 'Shrestha',
+              'Tamang', 'Thapa']
+SUBJECTS = ['Programming', 'Databases', 'Networks', 'Accounting', 'Statistics', 'Mathematics',
+            'Operating Systems', 'Economics', 'Web Technology', 'Software Engineering', 'Marketing',
+            'Data Structures']
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic teachers, department courses, clash-free schedules, meetings and "
+        "leave requests for benchmarking. Volumes scale linearly with --scale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help=f"1.0 is {TEACHERS} teachers, {SCHEDULES} schedules, "
+                                 f"{MEETINGS} meetings and {LEAVE_REQUESTS} leave requests.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for repeatable data.")
+        parser.add_argument('--password', default='password', help="Password for every generated teacher.")
+        parser.add_argument('--clear', action='store_true',
+                            help=f"Delete previously seeded rows (usernames starting with {SEED_PREFIX!r}) first.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0:
+            raise CommandError("--scale must be positive")
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        with transaction.atomic():
+            if options['clear']:
+                self._clear()
+            elif Teacher.objects.filter(username__startswith=SEED_PREFIX).exists():
+                raise CommandError("Seeded data already exists; pass --clear to replace it.")
+
+            depts = [Dept.objects.get_or_create(name=name)[0] for name, _ in Dept.DEPT_CHOICES]
+            teachers = self._teachers(max(len(depts), round(TEACHERS * options['scale'])), depts, options['password'])
+            courses = self._courses(depts, teachers)
+            schedules = self._schedules(round(SCHEDULES * options['scale']), depts, teachers, courses)
+            meetings = self._meetings(round(MEETINGS * options['scale']), teachers)
+            leaves = self._leave_requests(round(LEAVE_REQUESTS * options['scale']), teachers)
+
+            # bulk_create sends no signals, so refresh the derived data in one go
+            if search.is_available():
+                search.rebuild()
+            timetable.rebuild(self.batch_size)
+            bump_version('teachers', 'timetable', 'meetings', 'leave')
+            invalidate_rosters([dept.id for dept in depts])
+            invalidate_teacher_rows([t.pk for dept_staff in teachers.values() for t in dept_staff])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(map(len, teachers.values()))} teachers, "
+            f"{sum(map(len, courses.values()))} department courses, {schedules} schedules, {meetings} meetings and {leaves} leave requests."
+        ))
+
+    def _clear(self):
+        seeded = Teacher.objects.filter(username__startswith=SEED_PREFIX)
+        DepartmentCourse.objects.filter(teacher__in=seeded).delete()
+        # Schedules, meetings and leave requests cascade
+        seeded.delete()
+
+    def _teachers(self, count, depts, password):
+        # Hashing is deliberately slow; every seeded teacher shares one hash
+        hashed = make_password(password)
+        teachers = []
+        for i in range(1, count + 1):
+            teachers.append(Teacher(
+                username=f'{SEED_PREFIX}{i:06d}',
+                password=hashed,
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                email=f'{SEED_PREFIX}{i:06d}@example.com',
+                department=depts[i % len(depts)].name,
+            ))
+        Teacher.objects.bulk_create(assign_teacher_ids(teachers), batch_size=self.batch_size)
+
+        by_dept = {dept.name: [] for dept in depts}
+        for teacher in Teacher.objects.filter(username__startswith=SEED_PREFIX).order_by('id'):
+            by_dept[teacher.department].append(teacher)
+        return by_dept
+
+    def _courses(self, depts, teachers):
+        existing = set(DepartmentCourse.objects.values_list('dept_id', 'semester', 'course'))
+        names = {dept.name: [] for dept in depts}
+        new = []
+        for dept in depts:
+            for semester in SEMESTERS:
+                for subject in self.rng.sample(SUBJECTS, COURSES_PER_SEMESTER):
+                    name = f'{subject} {semester}'
+                    names[dept.name].append(name)
+                    if (dept.id, semester, name) not in existing:
+                        new.append(DepartmentCourse(
+                            dept=dept, semester=semester, course=name,
+                            teacher=self.rng.choice(teachers[dept.name]),
+                        ))
+        DepartmentCourse.objects.bulk_create(new, batch_size=self.batch_size)
+        return {
+            dept.name: list(DepartmentCourse.objects.filter(dept=dept, course__in=names[dept.name]).order_by('id'))
+            for dept in depts
+        }
+
+    def _schedules(self, count, depts, teachers, courses):
+        # Rooms are filled slot by slot. Within one slot every room gets a
+        # different teacher of the department, so neither rooms nor teachers
+        # are double-booked and the rows would pass Schedule.clean().
+        slots = [(day, hour) for day in DAYS for hour in HOURS]
+        created = 0
+        for n, dept in enumerate(depts):
+            wanted = count // len(depts) + (n < count % len(depts))
+            staff = teachers[dept.name]
+            rooms = min(ceil(wanted / len(slots)), len(staff))
+            rows = []
+            for slot_index, (day, hour) in enumerate(slots):
+                for room in range(rooms):
+                    if len(rows) == wanted:
+                        break
+                    course = self.rng.choice(courses[dept.name])
+                    rows.append(Schedule(
+                        course=course.course, department_course=course,
+                        teacher=staff[(slot_index * rooms + room) % len(staff)],
+                        dept=dept, day=day,
+                        start_time=time(hour), end_time=time(hour + 1),
+                        room=f'{SEED_PREFIX}{dept.name}-{room + 1:03d}',
+                    ))
+            Schedule.objects.bulk_create(rows, batch_size=self.batch_size)
+            created += len(rows)
+        return created
+
+    def _meetings(self, count, teachers):
+        # Some in the past, so purge_expired has work to do; one meeting per
+        # venue and hour, so they do not clash either
+        staff = [t for dept_staff in teachers.values() for t in dept_staff]
+        venues = [f'{SEED_PREFIX}hall-{i:02d}' for i in range(1, 21)]
+        start = now().date() - timedelta(days=15)
+        rows = []
+        for i in range(count):
+            slot, venue = divmod(i, len(venues))
+            day, hour = divmod(slot, 8)
+            rows.append(Meeting(
+                created_by=self.rng.choice(staff),
+                date=start + timedelta(days=day), time=time(9 + hour), venue=venues[venue],
+            ))
+        Meeting.objects.bulk_create(rows, batch_size=self.batch_size)
+        return len(rows)
+
+    def _leave_requests(self, count, teachers):
+        staff = [t for dept_staff in teachers.values() for t in dept_staff]
+        today = now().date()
+        rows = [
+            LeaveRequest(
+                teacher=self.rng.choice(staff),
+                date=today + timedelta(days=self.rng.randint(-30, 30)),
+                reason="Synthetic leave request",
+                status=self.rng.choices(['approved', 'pending', 'rejected'], weights=[6, 3, 1])[0],
+            )
+            for _ in range(count)
+        ]
+        LeaveRequest.objects.bulk_create(rows, batch_size=self.batch_size)
+        return len(rows)
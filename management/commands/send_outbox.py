@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from home.mailer import OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE, deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails in batches, reusing one mail connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument('--rate', type=float, default=0,
+                            help="Maximum messages per second (0 for no limit).")
+        parser.add_argument('--max-attempts', type=int, default=OUTBOX_MAX_ATTEMPTS)
+        parser.add_argument('--retry-base', type=int, default=OUTBOX_RETRY_BASE,
+                            help="Seconds before the first retry; doubles on every failure.")
+        parser.add_argument('--every', type=int, default=0,
+                            help="Poll the outbox every N seconds instead of draining it once.")
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = deliver_pending(
+                    batch_size=options['batch_size'],
+                    rate=options['rate'] or None,
+                    max_attempts=options['max_attempts'],
+                    retry_base=options['retry_base'],
+                )
+                total_sent += sent
+                total_failed += failed
+                if not sent and not failed:
+                    break
+            if total_sent or total_failed or not options['every']:
+                self.stdout.write(f"Sent {total_sent} email(s), {total_failed} failed.")
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(options['every'])
@@ -0,0 +1,209 @@
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_current = ContextVar('lms_request_stats', default=None)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """In-process per-route metrics; one instance per worker process."""
+
+    HISTOGRAMS = {
+        'lms_view_wall_seconds': ("Wall time spent handling the request.", SECONDS_BUCKETS),
+        'lms_view_sql_seconds': ("Time spent executing SQL.", SECONDS_BUCKETS),
+        'lms_view_render_seconds': ("Time spent rendering templates.", SECONDS_BUCKETS),
+        'lms_view_sql_queries': ("SQL statements executed.", QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in self.HISTOGRAMS}
+        self._repeated = defaultdict(int)
+
+    def observe(self, route, wall, stats):
+        values = {
+            'lms_view_wall_seconds': wall,
+            'lms_view_sql_seconds': stats.sql_time,
+            'lms_view_render_seconds': stats.render_time,
+            'lms_view_sql_queries': stats.sql_count,
+        }
+        with self._lock:
+            for name, value in values.items():
+                per_route = self._histograms[name]
+                if route not in per_route:
+                    per_route[route] = Histogram(self.HISTOGRAMS[name][1])
+                per_route[route].observe(value)
+            if stats.repeated:
+                self._repeated[route] += 1
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for route, histogram in sorted(self._histograms[name].items()):
+                    label = f'route="{_escape(route)}"'
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{label}}} {histogram.total}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+            lines += [
+                "# HELP lms_view_repeated_sql_total Requests that repeated one SQL statement (likely N+1).",
+                "# TYPE lms_view_repeated_sql_total counter",
+            ]
+            for route, count in sorted(self._repeated.items()):
+                lines.append(f'lms_view_repeated_sql_total{{route="{_escape(route)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = Registry()
+
+
+class _RequestStats:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self.repeated = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.sql_count += 1
+            self.statements[sql] += 1
+
+
+def _record(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    # Left on the connection for good: async views run their queries in
+    # sync_to_async threads with their own connections, and _current
+    # follows the request there. First in the list so that a temporary
+    # connection.execute_wrapper() pops its own wrapper, not this one.
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        started = perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.render_time += perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to the metrics middleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class QueryMetricsMiddleware:
+    """
+    Record per-route SQL count, SQL time, render time and wall time.
+
+    A request that runs the same SQL statement METRICS_REPEATED_SQL_THRESHOLD
+    times or more is counted and logged as a likely N+1.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'METRICS_REPEATED_SQL_THRESHOLD', 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = _RequestStats()
+        token = _current.set(stats)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, perf_counter() - started, stats)
+        return response
+
+    def observe(self, request, wall, stats):
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else 'unmatched'
+        stats.repeated = [sql for sql, count in stats.statements.items() if count >= self.threshold]
+        for sql in stats.repeated:
+            logger.warning("Possible N+1 in %s: %d x %s", route, stats.statements[sql], sql)
+        REGISTRY.observe(route, wall, stats)
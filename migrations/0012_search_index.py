@@ -0,0 +1,71 @@
+from django.db import migrations
+
+
+CREATE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS home_search USING fts5(
+    dept UNINDEXED,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+POPULATE_SQL = [
+    """
+    INSERT INTO home_search (rowid, dept, body)
+    SELECT s.id * 4 + 1, COALESCE(d.name, ''),
+           s.course || ' ' || COALESCE(t.first_name, '') || ' ' || COALESCE(t.last_name, '')
+           || ' ' || COALESCE(t.username, '') || ' ' || COALESCE(d.name, '')
+    FROM home_schedule s
+    LEFT JOIN home_teacher t ON t.id = s.teacher_id
+    LEFT JOIN home_dept d ON d.id = s.dept_id
+    """,
+    """
+    INSERT INTO home_search (rowid, dept, body)
+    SELECT t.id * 4 + 2, t.department,
+           t.username || ' ' || t.first_name || ' ' || t.last_name || ' ' || COALESCE(t.teacher_id, '')
+    FROM home_teacher t
+    """,
+    """
+    INSERT INTO home_search (rowid, dept, body)
+    SELECT c.id * 4 + 3, d.name,
+           c.course || ' ' || d.name || ' ' || COALESCE(t.first_name, '') || ' '
+           || COALESCE(t.last_name, '') || ' ' || COALESCE(t.username, '')
+    FROM home_departmentcourse c
+    JOIN home_dept d ON d.id = c.dept_id
+    LEFT JOIN home_teacher t ON t.id = c.teacher_id
+    """,
+]
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for (option,) in cursor.fetchall())
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only and optional there; without it search keeps icontains
+    if not fts5_available(schema_editor.connection):
+        return
+    schema_editor.execute(CREATE_SQL)
+    for statement in POPULATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS home_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_departmentcourse_teacher'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def widen_teacher_ids(apps, schema_editor):
+    Teacher = apps.get_model('home', 'Teacher')
+    TeacherIdSequence = apps.get_model('home', 'TeacherIdSequence')
+    prefix = getattr(settings, 'TEACHER_ID_PREFIX', '')
+    digits = getattr(settings, 'TEACHER_ID_DIGITS', 6)
+
+    # Re-pad the old random 3-digit ids to the new width and start the
+    # sequence after the highest one so allocated ids never collide.
+    highest = 0
+    for teacher in Teacher.objects.exclude(teacher_id=None).exclude(teacher_id='').only('pk', 'teacher_id'):
+        if not teacher.teacher_id.isdigit():
+            continue
+        number = int(teacher.teacher_id)
+        highest = max(highest, number)
+        teacher.teacher_id = f"{prefix}{number:0{digits}d}"
+        teacher.save(update_fields=['teacher_id'])
+    TeacherIdSequence.objects.update_or_create(pk=1, defaults={'next_value': highest + 1})
+
+    if 'home_search' in schema_editor.connection.introspection.table_names():
+        # Teacher search documents include the id
+        schema_editor.execute("DELETE FROM home_search WHERE rowid % 4 = 2")
+        schema_editor.execute(
+            "INSERT INTO home_search (rowid, dept, body) "
+            "SELECT t.id * 4 + 2, t.department, t.username || ' ' || t.first_name || ' ' "
+            "|| t.last_name || ' ' || COALESCE(t.teacher_id, '') FROM home_teacher t"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0013_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='teacher',
+            name='teacher_id',
+            field=models.CharField(blank=True, max_length=12, null=True, unique=True),
+        ),
+        migrations.RunPython(widen_teacher_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('home', '0014_teacheridsequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['date', 'status'], name='leave_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['date', 'teacher'], name='leave_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(fields=['date', 'time'], name='meeting_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['dept', 'teacher'], name='schedule_dept_teacher_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['dept', 'day', 'start_time', 'id'], name='schedule_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(django.db.models.functions.text.Lower('room'), name='schedule_room_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['department', 'is_superuser'], name='teacher_dept_super_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(condition=models.Q(('is_superuser', False)), fields=['id'], name='teacher_staff_idx'),
+        ),
+    ]
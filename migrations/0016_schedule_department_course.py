@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_department_courses(apps, schema_editor):
+    DepartmentCourse = apps.get_model('home', 'DepartmentCourse')
+    Schedule = apps.get_model('home', 'Schedule')
+
+    # Same rule as DepartmentCourse.match: case-insensitive name within the
+    # department, earliest semester first
+    courses = {}
+    for dc in DepartmentCourse.objects.order_by('-semester').only('pk', 'dept_id', 'course'):
+        courses[(dc.dept_id, dc.course.strip().lower())] = dc.pk
+
+    linked = [
+        Schedule(pk=pk, department_course_id=courses[(dept_id, course.strip().lower())])
+        for pk, dept_id, course in Schedule.objects.exclude(dept=None).values_list('pk', 'dept_id', 'course')
+        if (dept_id, course.strip().lower()) in courses
+    ]
+    Schedule.objects.bulk_update(linked, ['department_course'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='department_course',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='home.departmentcourse'),
+        ),
+        migrations.RunPython(link_department_courses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def materialize_timetable(apps, schema_editor):
+    Schedule = apps.get_model('home', 'Schedule')
+    TimetableSlot = apps.get_model('home', 'TimetableSlot')
+    # Weekly classes, as home.timetable.grid_cells did then; 0018 adds one-off classes
+    from home.timetable import SLOT_MINUTES, slot_range
+    from home.occupancy import normalize_day
+
+    cells = []
+    for schedule in Schedule.objects.filter(date=None).order_by('pk').iterator(chunk_size=1000):
+        weekday = normalize_day(schedule.day)
+        if weekday is None:
+            continue
+        for slot in slot_range(schedule.start_time, schedule.end_time):
+            cells.append(TimetableSlot(
+                schedule_id=schedule.pk, teacher_id=schedule.teacher_id, dept_id=schedule.dept_id,
+                weekday=weekday, slot=slot, course=schedule.course, room=schedule.room,
+                start_time=schedule.start_time, end_time=schedule.end_time,
+            ))
+    TimetableSlot.objects.bulk_create(cells, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0016_schedule_department_course'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('course', models.CharField(max_length=100)),
+                ('room', models.CharField(max_length=50)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('dept', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.dept')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='home.schedule')),
+                ('teacher', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['teacher', 'weekday', 'slot'], name='slot_teacher_week_idx'), models.Index(fields=['dept', 'weekday', 'slot'], name='slot_dept_week_idx')],
+            },
+        ),
+        migrations.RunPython(materialize_timetable, migrations.RunPython.noop),
+    ]
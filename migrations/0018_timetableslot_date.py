@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def materialize_one_off_classes(apps, schema_editor):
+    Schedule = apps.get_model('home', 'Schedule')
+    TimetableSlot = apps.get_model('home', 'TimetableSlot')
+    # Same cells as home.timetable.grid_cells, which needs the real models
+    from home.timetable import slot_range
+
+    cells = []
+    for schedule in Schedule.objects.exclude(date=None).order_by('pk').iterator(chunk_size=1000):
+        for slot in slot_range(schedule.start_time, schedule.end_time):
+            cells.append(TimetableSlot(
+                schedule_id=schedule.pk, teacher_id=schedule.teacher_id, dept_id=schedule.dept_id,
+                weekday=schedule.date.weekday(), slot=slot, course=schedule.course, room=schedule.room,
+                date=schedule.date, start_time=schedule.start_time, end_time=schedule.end_time,
+            ))
+    TimetableSlot.objects.bulk_create(cells, batch_size=1000)
+
+
+def drop_one_off_classes(apps, schema_editor):
+    apps.get_model('home', 'TimetableSlot').objects.exclude(date=None).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0017_timetableslot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetableslot',
+            name='date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(materialize_one_off_classes, drop_one_off_classes),
+    ]
@@ -1,21 +1,91 @@
-from django.db import models
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower, Trim
 from django.contrib.auth.models import AbstractUser
-import random
+
+
+def _to_python(instance, *names):
+    # Rows built in code may hold strings; bad ones raise ValidationError
+    for name in names:
+        setattr(instance, name, instance._meta.get_field(name).to_python(getattr(instance, name)))
+
+
+TEACHER_ID_MAX_LENGTH = 12
+
+
+def format_teacher_id(number):
+    # e.g. TEACHER_ID_PREFIX='T', TEACHER_ID_DIGITS=6 -> 'T000042'
+    prefix = getattr(settings, 'TEACHER_ID_PREFIX', '')
+    digits = getattr(settings, 'TEACHER_ID_DIGITS', 6)
+    teacher_id = f"{prefix}{number:0{digits}d}"
+    if len(teacher_id) > TEACHER_ID_MAX_LENGTH:
+        # The sequence outgrew TEACHER_ID_DIGITS
+        raise ValueError(f"Teacher id {teacher_id!r} is longer than {TEACHER_ID_MAX_LENGTH} characters")
+    return teacher_id
+
+
+@checks.register(checks.Tags.models)
+def check_teacher_id_length(app_configs, **kwargs):
+    width = len(getattr(settings, 'TEACHER_ID_PREFIX', '')) + getattr(settings, 'TEACHER_ID_DIGITS', 6)
+    if width <= TEACHER_ID_MAX_LENGTH:
+        return []
+    return [checks.Error(
+        f"TEACHER_ID_PREFIX and TEACHER_ID_DIGITS make {width}-character teacher ids; "
+        f"Teacher.teacher_id holds {TEACHER_ID_MAX_LENGTH}.",
+        id='home.E001',
+    )]
+
+
+class TeacherIdSequence(models.Model):
+    """Single-row counter that hands out teacher_id values."""
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    @classmethod
+    def reserve(cls, count=1):
+        """Reserve a block of ``count`` consecutive teacher ids."""
+        # Update and read back on the same database: a read routed to a
+        # replica could see a stale counter
+        using = router.db_for_write(cls)
+        sequence = cls.objects.using(using)
+        with transaction.atomic(using=using):
+            # The UPDATE takes the row (or, on SQLite, database) write lock,
+            # so concurrent callers always get disjoint blocks.
+            if not sequence.filter(pk=1).update(next_value=F('next_value') + count):
+                sequence.get_or_create(pk=1)
+                sequence.filter(pk=1).update(next_value=F('next_value') + count)
+            end = sequence.values_list('next_value', flat=True).get(pk=1)
+        return [format_teacher_id(number) for number in range(end - count, end)]
+
+
+def assign_teacher_ids(teachers):
+    """Fill in teacher_id for unsaved teachers, e.g. before bulk_create."""
+    missing = [t for t in teachers if not t.teacher_id]
+    for teacher, teacher_id in zip(missing, TeacherIdSequence.reserve(len(missing)) if missing else []):
+        teacher.teacher_id = teacher_id
+    return teachers
+
 
 class Teacher(AbstractUser): 
     department = models.CharField(max_length=100) 
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
-    teacher_id = models.CharField(max_length=3, unique=True, blank=True, null=True)
+    teacher_id = models.CharField(max_length=TEACHER_ID_MAX_LENGTH, unique=True, blank=True, null=True)
 
     def save(self, *args, **kwargs):
         if not self.teacher_id:
-            while True:
-                random_id = f"{random.randint(100, 999)}"
-                if not Teacher.objects.filter(teacher_id=random_id).exists():
-                    self.teacher_id = random_id
-                    break
+            self.teacher_id = TeacherIdSequence.reserve()[0]
         super().save(*args, **kwargs)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Department rosters and meeting notices exclude superusers
+            models.Index(fields=['department', 'is_superuser'], name='teacher_dept_super_idx'),
+            # teacher_list and the schedule page only ever show non-superusers
+            models.Index(fields=['id'], condition=Q(is_superuser=False), name='teacher_staff_idx'),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -41,6 +111,31 @@ class DepartmentCourse(models.Model):
     class Meta:
         unique_together = ('dept', 'semester', 'course')
 
+    @staticmethod
+    def _named(queryset, dept_id, course):
+        # Names match ignoring case and surrounding spaces
+        return queryset.alias(course_key=Lower(Trim('course'))).filter(dept_id=dept_id, course_key=course.strip().lower())
+
+    @classmethod
+    def match(cls, dept_id, course):
+        """The course a free-text schedule entry refers to; the earliest semester wins."""
+        if not dept_id or not course:
+            return None
+        return cls._named(cls.objects, dept_id, course).order_by('semester').first()
+
+    @classmethod
+    def relink(cls, dept_id, course):
+        """
+        Point every schedule named ``course`` in ``dept_id`` at its current
+        match, once courses by that name were added, renamed or deleted.
+        Returns the schedules' teacher ids, whose roster rows show the semester.
+        """
+        if not dept_id or not course:
+            return set()
+        schedules = cls._named(Schedule.objects, dept_id, course)
+        schedules.update(department_course=cls.match(dept_id, course))
+        return set(schedules.values_list('teacher_id', flat=True))
+
     def __str__(self):
         teacher_name = f"{self.teacher.first_name} {self.teacher.last_name}" if self.teacher else "Unassigned"
         return f"{self.dept.name} - Semester {self.semester} - {self.course} ({teacher_name})"
@@ -57,12 +152,71 @@ class Schedule(models.Model):
         related_name='schedules'
     )
     dept = models.ForeignKey(Dept, on_delete=models.CASCADE, null=True, blank=True, related_name='schedules')
+    # Resolved from dept and course on save, see DepartmentCourse.match
+    department_course = models.ForeignKey(
+        DepartmentCourse, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='schedules'
+    )
     day = models.CharField(max_length=20)
     date = models.DateField(null=True, blank=True)
     start_time = models.TimeField()
     end_time = models.TimeField()
     room = models.CharField(max_length=50)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['dept', 'teacher'], name='schedule_dept_teacher_idx'),
+            # Keyset pagination order, see pagination.SCHEDULE_ORDERING
+            models.Index(fields=['dept', 'day', 'start_time', 'id'], name='schedule_keyset_idx'),
+            # Clash checks look rooms up case-insensitively
+            models.Index(Lower('room'), name='schedule_room_idx'),
+        ]
+
+    def clean(self):
+        # Double-booked rooms and teachers; forms and the admin call this via full_clean()
+        from .occupancy import schedule_conflicts
+        _to_python(self, 'date', 'start_time', 'end_time')
+        # Missing values are reported by field validation
+        if not self.day or self.start_time is None or self.end_time is None:
+            return
+        conflicts = schedule_conflicts(self)
+        if conflicts:
+            raise ValidationError(conflicts)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'dept', 'course'} & set(update_fields):
+            self.department_course = DepartmentCourse.match(self.dept_id, self.course)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'department_course'}
+        super().save(*args, **kwargs)
+
+
+class TimetableSlot(models.Model):
+    """
+    One cell of the weekly grid: ``schedule`` occupies ``slot`` on ``weekday``.
+
+    Materialized from Schedule rows by home.timetable, so teacher and
+    department week views are a single range read on one index. Cells of
+    one-off classes carry their ``date`` and only count in that week.
+    """
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE, related_name='slots')
+    # Covered by the week indexes below
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, null=True, db_index=False, related_name='+')
+    dept = models.ForeignKey(Dept, on_delete=models.CASCADE, null=True, db_index=False, related_name='+')
+    weekday = models.PositiveSmallIntegerField()  # Monday=0
+    slot = models.PositiveSmallIntegerField()  # minutes since midnight // TIMETABLE_SLOT_MINUTES
+    course = models.CharField(max_length=100)
+    room = models.CharField(max_length=50)
+    date = models.DateField(null=True, blank=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['teacher', 'weekday', 'slot'], name='slot_teacher_week_idx'),
+            models.Index(fields=['dept', 'weekday', 'slot'], name='slot_dept_week_idx'),
+        ]
+
     def __str__(self):
         return f'{self.course} - {self.day}'
 
@@ -81,6 +235,21 @@ class Meeting(models.Model):
     time = models.TimeField()
     venue = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'time'], name='meeting_date_idx'),
+        ]
+
+    def clean(self):
+        from .occupancy import meeting_conflicts
+        _to_python(self, 'date', 'time')
+        # Missing values are reported by field validation
+        if self.date is None or self.time is None:
+            return
+        conflicts = meeting_conflicts(self)
+        if conflicts:
+            raise ValidationError(conflicts)
+
     def __str__(self):
         return f"Meeting at {self.venue} on {self.date} at {self.time}"
 
@@ -366,9 +535,42 @@ class LeaveRequest(models.Model):
     ], default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'status'], name='leave_date_status_idx'),
+            # "Who is on approved leave today" on the schedule page
+            models.Index(fields=['date', 'teacher'], condition=Q(status='approved'), name='leave_approved_idx'),
+        ]
+
     def __str__(self):
         return f"{self.teacher.username} - {self.date} - {self.status}"
 
     @property
     def is_today(self):
         return self.date == timezone.now().date()
+
+
+class OutboxEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)  # Blank uses DEFAULT_FROM_EMAIL
+    recipient = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} - {self.subject} ({self.status})"
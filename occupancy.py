@@ -0,0 +1,238 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date, time
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Lower, Substr, Trim
+
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def normalize_day(day):
+    """Weekday index (Monday=0) for free-text days like 'Sun' or ' sunday'."""
+    key = (day or '').strip().lower()[:3]
+    for index, name in enumerate(WEEKDAYS):
+        if name.startswith(key) and key:
+            return index
+    return None
+
+
+def _day_keys(weekday):
+    """The three-letter day keys normalize_day maps to ``weekday``: 'su' and 'sun' for Sunday."""
+    name = WEEKDAYS[weekday]
+    return [name[:n] for n in (1, 2, 3) if normalize_day(name[:n]) == weekday]
+
+
+def _on_weekday(weekday, on_date=None):
+    """
+    Q for rows meeting on ``weekday``: weekly classes that day plus one-off
+    classes on ``on_date`` or, without it, on any date that falls on it.
+    Needs the ``day_key`` annotation from _with_day_key.
+    """
+    weekly = Q(date__isnull=True, day_key__in=_day_keys(weekday))
+    if on_date is not None:
+        return weekly | Q(date=on_date)
+    # __week_day counts from Sunday=1
+    return weekly | Q(date__week_day=(weekday + 1) % 7 + 1)
+
+
+def _with_day_key(queryset):
+    return queryset.annotate(day_key=Substr(Lower(Trim('day')), 1, 3))
+
+
+def _minutes(value):
+    if isinstance(value, str):
+        value = time.fromisoformat(value)
+    return value.hour * 60 + value.minute
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _room_key(room):
+    return (room or '').strip().lower()
+
+
+def _label(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class IntervalIndex:
+    """
+    Half-open [start, end) intervals, in minutes since midnight, grouped by start.
+
+    A day has at most 1440 distinct starts (a timetable uses a few dozen),
+    so the sorted list of starts stays short and adding an interval is an
+    append to its start's bucket; nothing is shifted as the index grows.
+    Intervals are never longer than ``_longest``, so only buckets starting
+    in (start - longest, end) can overlap a query; both ends of that window
+    are found with bisect.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._buckets = {}
+        self._longest = 0
+
+    def add(self, start, end, item):
+        bucket = self._buckets.get(start)
+        if bucket is None:
+            insort(self._starts, start)
+            bucket = self._buckets[start] = []
+        bucket.append((end, item))
+        self._longest = max(self._longest, end - start)
+
+    def remove(self, start, end, item):
+        bucket = self._buckets.get(start, [])
+        for i, (_, other) in enumerate(bucket):
+            if other is item:
+                del bucket[i]
+                return
+
+    def overlapping(self, start, end):
+        lo = bisect_right(self._starts, start - self._longest)
+        hi = bisect_left(self._starts, end)
+        return [item for s in self._starts[lo:hi] for e, item in self._buckets[s] if e > start]
+
+
+def _weekday(schedule):
+    # A one-off class falls on its date's weekday whatever its day says
+    if schedule.date:
+        return _as_date(schedule.date).weekday()
+    return normalize_day(schedule.day)
+
+
+def _same_occurrence(a, b):
+    """False only for one-off classes on different dates; weekly classes meet every week."""
+    return not (a.date and b.date) or _as_date(a.date) == _as_date(b.date)
+
+
+class OccupancyIndex:
+    """
+    Per-weekday interval indexes for every room and every teacher.
+
+    One-off classes (``date`` set) are indexed under their date's weekday
+    and clash with weekly classes that day and with one-off classes on the
+    same date only.
+    """
+
+    def __init__(self):
+        self.rooms = defaultdict(IntervalIndex)
+        self.teachers = defaultdict(IntervalIndex)
+
+    @staticmethod
+    def _slot(schedule):
+        weekday = _weekday(schedule)
+        if weekday is None:
+            return None
+        return weekday, _minutes(schedule.start_time), _minutes(schedule.end_time)
+
+    def add(self, schedule):
+        slot = self._slot(schedule)
+        if slot is None:
+            return
+        weekday, start, end = slot
+        self.rooms[weekday, _room_key(schedule.room)].add(start, end, schedule)
+        if schedule.teacher_id:
+            self.teachers[weekday, schedule.teacher_id].add(start, end, schedule)
+
+    def remove(self, schedule):
+        slot = self._slot(schedule)
+        if slot is None:
+            return
+        weekday, start, end = slot
+        self.rooms[weekday, _room_key(schedule.room)].remove(start, end, schedule)
+        if schedule.teacher_id:
+            self.teachers[weekday, schedule.teacher_id].remove(start, end, schedule)
+
+    def conflicts(self, schedule):
+        """Human-readable clashes between ``schedule`` and the indexed rows."""
+        slot = self._slot(schedule)
+        if slot is None:
+            return []
+        weekday, start, end = slot
+        problems = []
+        for other in self.rooms[weekday, _room_key(schedule.room)].overlapping(start, end):
+            if not _same_occurrence(schedule, other):
+                continue
+            problems.append(
+                f"Room {schedule.room} is already booked on {other.day} "
+                f"{_label(_minutes(other.start_time))}-{_label(_minutes(other.end_time))} for {other.course}."
+            )
+        if schedule.teacher_id:
+            for other in self.teachers[weekday, schedule.teacher_id].overlapping(start, end):
+                if not _same_occurrence(schedule, other):
+                    continue
+                problems.append(
+                    f"The teacher already teaches {other.course} on {other.day} "
+                    f"{_label(_minutes(other.start_time))}-{_label(_minutes(other.end_time))}."
+                )
+        return problems
+
+
+def schedule_conflicts(schedule):
+    """
+    Clashes for one proposed row, for Schedule.clean().
+
+    The database narrows the candidates to rows in the same room or with
+    the same teacher (both indexed), meeting on the same weekday or date,
+    and overlapping in time, so a check reads only the clashing rows.
+    """
+    from .models import Schedule
+
+    weekday = _weekday(schedule)
+    if weekday is None:
+        return []
+    # Lower('room') matches the schedule_room_idx expression index
+    related = Q(room_key=_room_key(schedule.room))
+    if schedule.teacher_id:
+        related |= Q(teacher_id=schedule.teacher_id)
+    others = _with_day_key(Schedule.objects.annotate(room_key=Lower('room'))).filter(
+        related,
+        _on_weekday(weekday, _as_date(schedule.date)),
+        start_time__lt=schedule.end_time,
+        end_time__gt=schedule.start_time,
+    ).only('id', 'course', 'teacher_id', 'day', 'date', 'start_time', 'end_time', 'room')
+    if schedule.pk:
+        others = others.exclude(pk=schedule.pk)
+
+    index = OccupancyIndex()
+    for other in others:
+        index.add(other)
+    return index.conflicts(schedule)
+
+
+def meeting_conflicts(meeting):
+    from .models import Meeting, Schedule
+
+    on_date = _as_date(meeting.date)
+    start = _minutes(meeting.time)
+    end = start + getattr(settings, 'MEETING_DURATION_MINUTES', 60)
+    venue = (meeting.venue or '').strip()
+    problems = []
+
+    classes = IntervalIndex()
+    # Weekly classes in the room that weekday, and one-off classes on the meeting's date
+    rooms = _with_day_key(Schedule.objects.annotate(room_key=Lower('room'))).filter(
+        _on_weekday(on_date.weekday(), on_date), room_key=_room_key(venue),
+    )
+    for s in rooms.only('course', 'day', 'date', 'start_time', 'end_time'):
+        classes.add(_minutes(s.start_time), _minutes(s.end_time), s)
+    for s in classes.overlapping(start, end):
+        problems.append(
+            f"{venue} has {s.course} from {_label(_minutes(s.start_time))} to {_label(_minutes(s.end_time))}."
+        )
+
+    others = Meeting.objects.filter(venue__iexact=venue, date=on_date)
+    if meeting.pk:
+        others = others.exclude(pk=meeting.pk)
+    meetings = IntervalIndex()
+    for m in others:
+        m_start = _minutes(m.time)
+        meetings.add(m_start, m_start + getattr(settings, 'MEETING_DURATION_MINUTES', 60), m)
+    for m in meetings.overlapping(start, end):
+        problems.append(f"{venue} already hosts a meeting at {_label(_minutes(m.time))}.")
+    return problems
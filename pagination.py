@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import time
+
+from django.db.models import F, Q
+
+
+SCHEDULE_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Keyset order for schedule listings. NULL departments sort first, which is
+# also what SQLite does for a plain ascending index on dept_id.
+SCHEDULE_ORDERING = (
+    F('dept_id').asc(nulls_first=True),
+    'day',
+    'start_time',
+    'id',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(schedule):
+    """Opaque cursor pointing just past the given schedule row."""
+    payload = [
+        schedule.dept_id,
+        schedule.day,
+        schedule.start_time.strftime('%H:%M:%S'),
+        schedule.id,
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dept_id, day, start_time, pk = json.loads(raw)
+        start_time = time.fromisoformat(start_time)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if (dept_id is not None and not isinstance(dept_id, int)) or not isinstance(day, str) \
+            or not isinstance(pk, int):
+        raise InvalidCursor(cursor)
+    return dept_id, day, start_time, pk
+
+
+def _after(dept_id, day, start_time, pk):
+    """Rows strictly after (dept_id, day, start_time, id) in SCHEDULE_ORDERING."""
+    within_dept = (
+        Q(day__gt=day) |
+        Q(day=day, start_time__gt=start_time) |
+        Q(day=day, start_time=start_time, id__gt=pk)
+    )
+    if dept_id is None:
+        return Q(dept__isnull=False) | (Q(dept__isnull=True) & within_dept)
+    return Q(dept_id__gt=dept_id) | (Q(dept_id=dept_id) & within_dept)
+
+
+def page_size_from(value, default=SCHEDULE_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate_schedules(schedules, cursor=None, page_size=SCHEDULE_PAGE_SIZE):
+    """
+    Return one page of ``schedules`` and the cursor for the next page.
+
+    Pages are seeked with a WHERE clause on the sort key rather than an
+    OFFSET, so fetching page N costs the same as fetching the first page.
+    Raises InvalidCursor for a cursor that was not produced by encode_cursor.
+    """
+    schedules = schedules.order_by(*SCHEDULE_ORDERING)
+    if cursor:
+        schedules = schedules.filter(_after(*decode_cursor(cursor)))
+
+    rows = list(schedules[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
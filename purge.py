@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from .ical import HISTORY_DAYS
+from .models import LeaveRequest, Meeting
+
+
+PURGE_BATCH_SIZE = 500
+
+
+def _delete_in_batches(queryset, batch_size, pause=0):
+    # Short transactions keep SQLite's write lock free for request traffic
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        if pause:
+            time.sleep(pause)
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE, pause=0, today=None):
+    """
+    Delete meetings and leave requests dated before today.
+
+    Approved leave from the last ical.HISTORY_DAYS is kept: calendar feeds
+    still show those weeks and list the leave as cancelled classes.
+    """
+    today = today or now().date()
+    expired_leave = LeaveRequest.objects.filter(date__lt=today).exclude(
+        status='approved', date__gte=today - timedelta(days=HISTORY_DAYS),
+    )
+    return {
+        'meetings': _delete_in_batches(Meeting.objects.filter(date__lt=today), batch_size, pause),
+        'leave_requests': _delete_in_batches(expired_leave, batch_size, pause),
+    }
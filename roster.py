@@ -0,0 +1,102 @@
+import hashlib
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min, Q
+
+from .caching import bump_version, get_versions
+from .models import Dept, Schedule
+
+
+ROSTER_CACHE_TIMEOUT = getattr(settings, 'ROSTER_CACHE_TIMEOUT', 300)
+
+
+def _dept_id(dept_name):
+    key = f'dept-id:{dept_name}'
+    dept_id = cache.get(key)
+    if dept_id is None:
+        # 0 remembers a missing department; saving a Dept deletes the key
+        dept_id = Dept.objects.filter(name=dept_name).values_list('id', flat=True).first() or 0
+        cache.set(key, dept_id, timeout=None)
+    return dept_id or None
+
+
+TEACHER_FIELDS = ('teacher__username', 'teacher__first_name', 'teacher__last_name')
+
+
+def build_roster(dept_id, query=''):
+    """Courses and semesters taught in a department, grouped by teacher whose name contains ``query``."""
+    schedules = Schedule.objects.filter(dept_id=dept_id, teacher__isnull=False)
+    if query:
+        schedules = schedules.filter(
+            Q(teacher__username__icontains=query)
+            | Q(teacher__first_name__icontains=query)
+            | Q(teacher__last_name__icontains=query)
+        )
+    # One row per (teacher, course), already grouped and sorted by the
+    # database; the loop below only nests consecutive rows
+    rows = (
+        schedules
+        .values('teacher_id', *TEACHER_FIELDS, 'course')
+        .annotate(semester=Min('department_course__semester'), sessions=Count('id'))
+        .order_by('teacher__first_name', 'teacher__last_name', 'teacher_id', 'semester', 'course')
+    )
+
+    department_data = []
+    for _, group in groupby(rows, key=lambda row: row['teacher_id']):
+        group = list(group)
+        department_data.append({
+            'teacher': {
+                'id': group[0]['teacher_id'],
+                'username': group[0]['teacher__username'],
+                'first_name': group[0]['teacher__first_name'],
+                'last_name': group[0]['teacher__last_name'],
+            },
+            'courses': [
+                {
+                    'name': row['course'],
+                    'semester': row['semester'] if row['semester'] is not None else "N/A",
+                    'sessions': row['sessions'],
+                }
+                for row in group
+            ],
+        })
+    return department_data
+
+
+def department_roster(dept_name, query=''):
+    """Cached roster for ``dept_name`` searched for ``query``, or None if there is no such department."""
+    dept_id = _dept_id(dept_name)
+    if dept_id is None:
+        return None
+
+    versions = get_versions([f'roster:{dept_id}', 'teachers'])
+    key = f"roster:{dept_id}:{versions[f'roster:{dept_id}']}:{versions['teachers']}"
+    if query:
+        # Names match case-insensitively, so "Ann" and "ann" share an entry
+        key += ':' + hashlib.sha1(query.lower().encode()).hexdigest()
+    department_data = cache.get(key)
+    if department_data is None:
+        department_data = build_roster(dept_id, query)
+        cache.set(key, department_data, ROSTER_CACHE_TIMEOUT)
+    return department_data
+
+
+def teacher_timetable_scope(teacher_id):
+    return f'teacher-timetable:{teacher_id}'
+
+
+def with_row_versions(department_data):
+    """Roster entries plus the version their cached table rows are keyed on."""
+    scopes = {entry['teacher']['id']: teacher_timetable_scope(entry['teacher']['id']) for entry in department_data}
+    versions = get_versions(scopes.values())
+    return [{**entry, 'version': versions[scopes[entry['teacher']['id']]]} for entry in department_data]
+
+
+def invalidate_rosters(dept_ids):
+    bump_version(*{f'roster:{dept_id}' for dept_id in dept_ids if dept_id})
+
+
+def invalidate_teacher_rows(teacher_ids):
+    bump_version(*{teacher_timetable_scope(teacher_id) for teacher_id in teacher_ids if teacher_id})
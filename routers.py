@@ -0,0 +1,72 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+REPLICA = 'replica'
+# After a write the same browser reads from the primary for this long, so
+# it sees its own change even if the replica is a little behind
+PRIMARY_PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+PRIMARY_PIN_COOKIE = 'db_primary'
+
+_read_only = ContextVar('read_only_request', default=False)
+
+
+class ReplicaRouter:
+    """
+    Send reads made while serving a read-only request to the ``replica``
+    database when one is configured; everything else uses ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _read_only.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds a copy of the same tables
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Mark GET/HEAD requests as read-only for ReplicaRouter."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _read_only.set(self.read_only(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_only.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so queries run in worker threads see the flag
+        token = _read_only.set(self.read_only(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_only.reset(token)
+        return self.pin(request, response)
+
+    def read_only(self, request):
+        return request.method in ('GET', 'HEAD') and PRIMARY_PIN_COOKIE not in request.COOKIES
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and REPLICA in settings.DATABASES:
+            response.set_cookie(PRIMARY_PIN_COOKIE, '1', max_age=PRIMARY_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
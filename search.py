@@ -0,0 +1,144 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+
+# SQLite FTS5 index over teachers, schedules and department courses.
+# Every document lives in one table; the rowid encodes both the object's
+# primary key and its kind so updates and deletes are rowid lookups.
+SEARCH_TABLE = 'home_search'
+
+SCHEDULE = 1
+TEACHER = 2
+COURSE = 3
+_KINDS = 4
+
+_TOKEN_RE = re.compile(r'\w+')
+
+REBUILD_SQL = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, dept, body)
+    SELECT s.id * {_KINDS} + {SCHEDULE}, COALESCE(d.name, ''),
+           s.course || ' ' || COALESCE(t.first_name, '') || ' ' || COALESCE(t.last_name, '')
+           || ' ' || COALESCE(t.username, '') || ' ' || COALESCE(d.name, '')
+    FROM home_schedule s
+    LEFT JOIN home_teacher t ON t.id = s.teacher_id
+    LEFT JOIN home_dept d ON d.id = s.dept_id
+    """,
+    f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, dept, body)
+    SELECT t.id * {_KINDS} + {TEACHER}, t.department,
+           t.username || ' ' || t.first_name || ' ' || t.last_name || ' ' || COALESCE(t.teacher_id, '')
+    FROM home_teacher t
+    """,
+    f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, dept, body)
+    SELECT c.id * {_KINDS} + {COURSE}, d.name,
+           c.course || ' ' || d.name || ' ' || COALESCE(t.first_name, '') || ' '
+           || COALESCE(t.last_name, '') || ' ' || COALESCE(t.username, '')
+    FROM home_departmentcourse c
+    JOIN home_dept d ON d.id = c.dept_id
+    LEFT JOIN home_teacher t ON t.id = c.teacher_id
+    """,
+]
+
+
+_fts5 = None
+
+
+def is_available():
+    """True on SQLite builds with FTS5; elsewhere callers keep their icontains filters."""
+    global _fts5
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts5 is None:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            _fts5 = any(option == 'ENABLE_FTS5' for (option,) in cursor.fetchall())
+    return _fts5
+
+
+def _rowid(kind, pk):
+    return pk * _KINDS + kind
+
+
+def _join(*parts):
+    return ' '.join(p for p in parts if p)
+
+
+def match_expression(query):
+    # Quote every word and match it as a prefix so search-as-you-type works
+    # and FTS5 operators typed by users are treated as plain text.
+    return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+
+def matching(kind, query):
+    """
+    Subquery of the primary keys of ``kind`` documents matching ``query``,
+    for ``pk__in`` filters. Matches are not ranked: callers keep their own
+    ordering so results page like any other rows. None when the index is
+    unavailable or ``query`` has no words.
+    """
+    expression = match_expression(query)
+    if not expression or not is_available():
+        return None
+    return RawSQL(
+        f"SELECT rowid / {_KINDS} FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid %% {_KINDS} = %s",
+        [expression, kind],
+    )
+
+
+def _replace(kind, documents):
+    # documents: iterable of (pk, dept, body)
+    rows = [(_rowid(kind, pk), dept or '', body) for pk, dept, body in documents]
+    if not rows or not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(r[0],) for r in rows])
+        cursor.executemany(f"INSERT INTO {SEARCH_TABLE} (rowid, dept, body) VALUES (%s, %s, %s)", rows)
+
+
+def remove(kind, pks):
+    if not pks or not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [(_rowid(kind, pk),) for pk in pks],
+        )
+
+
+def index_schedules(schedules):
+    documents = []
+    for s in schedules:
+        teacher, dept = s.teacher, s.dept
+        dept_name = dept.name if dept else ''
+        names = (teacher.first_name, teacher.last_name, teacher.username) if teacher else ()
+        documents.append((s.pk, dept_name, _join(s.course, *names, dept_name)))
+    _replace(SCHEDULE, documents)
+
+
+def index_teachers(teachers):
+    _replace(TEACHER, [
+        (t.pk, t.department, _join(t.username, t.first_name, t.last_name, t.teacher_id))
+        for t in teachers
+    ])
+
+
+def index_courses(courses):
+    documents = []
+    for c in courses:
+        teacher = c.teacher
+        names = (teacher.first_name, teacher.last_name, teacher.username) if teacher else ()
+        documents.append((c.pk, c.dept.name, _join(c.course, c.dept.name, *names)))
+    _replace(COURSE, documents)
+
+
+def rebuild():
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for statement in REBUILD_SQL:
+            cursor.execute(statement)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Serves collected static files with far-future caching, before any other work
+    'home.assets.StaticAssetMiddleware',
+    'home.metrics.QueryMetricsMiddleware',
+    'home.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,10 +59,17 @@ ROOT_URLCONF = 'llms.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also reports render time to QueryMetricsMiddleware
+        'BACKEND': 'home.metrics.TimedDjangoTemplates',
         'DIRS': [ BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parsed templates are kept in memory; restart to pick up edits
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -74,17 +86,81 @@ WSGI_APPLICATION = 'llms.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# WAL lets readers run while a write is in progress; synchronous=NORMAL is
+# safe with WAL and skips an fsync per commit. mmap_size and cache_size
+# (negative means KiB) keep hot pages in memory.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA cache_size=-65536;'
+    'PRAGMA temp_store=MEMORY'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': 'mydb',
-        'USER': 'root',
-        'PASSWORD': 'admin',
-        'HOST':'localhost',
-        'PORT':'3306',
+        'NAME': BASE_DIR / 'mydb',
+        # Keep connections open between requests (pragmas run once per
+        # connection). asgi.py sets LMS_CONN_MAX_AGE=0: Django advises
+        # against persistent connections under ASGI.
+        'CONN_MAX_AGE': int(os.environ.get('LMS_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            # Take the write lock at BEGIN so concurrent writers wait instead of failing
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    }
+}
+
+# Optional read replica: GET/HEAD requests read from it (see home.routers).
+# To try it locally, copy mydb and set LMS_REPLICA_DB to the copy's path.
+if os.environ.get('LMS_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['LMS_REPLICA_DB'],
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            'init_command': SQLITE_PRAGMAS + ';PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['home.routers.ReplicaRouter']
+
+# Browsers that just wrote read from the primary for this many seconds
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# Cached pages use versioned keys that signals bump on every change. The
+# cache lives in files so every worker process on this host sees a bump;
+# with workers on several hosts, point it at Redis or Memcached instead.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('LMS_CACHE_DIR', BASE_DIR / 'cache'),
     }
 }
 
+# Sessions and the logged-in user are read from the cache first; the
+# session table and Teacher row are only queried on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+AUTHENTICATION_BACKENDS = ['home.backends.CachedModelBackend']
+
+# Upper bound on how long a logged-in user may be served from cache
+USER_CACHE_TIMEOUT = 60 * 15
+
+# Upper bound on how long a department roster may be served from cache
+ROSTER_CACHE_TIMEOUT = 300
+
+# Upper bound on how long a generated calendar feed is kept
+ICAL_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -126,6 +202,19 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# Build step: python manage.py collectstatic --noinput
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # Hashed names, .gz/.br copies and WebP/AVIF image variants
+        'BACKEND': 'home.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
 
 import os
 from pathlib import Path
@@ -135,6 +224,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Resize profile pictures on a background thread after the upload commits
+THUMBNAILS_IN_BACKGROUND = True
+
 
 
 
@@ -145,6 +237,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'home.Teacher'
 
+# Allocated teacher ids look like f'{TEACHER_ID_PREFIX}{n:0{TEACHER_ID_DIGITS}d}'
+# (max 12 characters). Changing the width only affects new ids.
+TEACHER_ID_PREFIX = ''
+TEACHER_ID_DIGITS = 6
+
+# Row height of the materialized week grid; run rebuild_timetable after changing it
+TIMETABLE_SLOT_MINUTES = 30
+
+# Meetings only store a start time; assume this length for clash checks
+MEETING_DURATION_MINUTES = 60
+
+# Requests running one SQL statement this many times are flagged as likely N+1
+METRICS_REPEATED_SQL_THRESHOLD = 5
+
 
 
 
@@ -0,0 +1,268 @@
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import events, search, thumbnails, timetable
+from .backends import forget_user
+from .caching import bump_version
+from .dashboard import department_meetings_scope
+from .models import DepartmentCourse, Dept, LeaveRequest, Meeting, Schedule, Teacher
+from .roster import invalidate_rosters, invalidate_teacher_rows
+
+
+# Keep the full-text search index in step with the rows it covers.
+
+@receiver(post_save, sender=Schedule)
+def index_schedule(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_schedules([instance])
+
+
+@receiver(post_delete, sender=Schedule)
+def unindex_schedule(sender, instance, **kwargs):
+    search.remove(search.SCHEDULE, [instance.pk])
+
+
+# Deleting a schedule cascades to its grid cells
+@receiver(post_save, sender=Schedule)
+def materialize_schedule(sender, instance, raw=False, **kwargs):
+    if not raw:
+        timetable.materialize([instance])
+
+
+@receiver(post_save, sender=DepartmentCourse)
+def index_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_courses([instance])
+
+
+@receiver(post_delete, sender=DepartmentCourse)
+def unindex_course(sender, instance, **kwargs):
+    search.remove(search.COURSE, [instance.pk])
+
+
+@receiver(post_save, sender=Teacher)
+def index_teacher(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which no document contains
+    if raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    search.index_teachers([instance])
+    if not created:
+        # Schedules and courses carry the teacher's name in their documents
+        search.index_schedules(instance.schedules.select_related('teacher', 'dept'))
+        search.index_courses(instance.department_courses.select_related('teacher', 'dept'))
+
+
+@receiver(pre_delete, sender=Teacher)
+def remember_teacher_courses(sender, instance, **kwargs):
+    # Courses are detached with SET_NULL (no signals), so note them now
+    instance._search_course_ids = list(instance.department_courses.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Teacher)
+def unindex_teacher(sender, instance, **kwargs):
+    search.remove(search.TEACHER, [instance.pk])
+    course_ids = getattr(instance, '_search_course_ids', [])
+    if course_ids:
+        search.index_courses(DepartmentCourse.objects.filter(pk__in=course_ids).select_related('teacher', 'dept'))
+
+
+# Department rosters are cached under versioned keys; bump the version of
+# every department a change touches, including the one a row moved out of.
+# Their table rows are cached per teacher, so the same goes for teachers.
+
+@receiver(pre_save, sender=Schedule)
+@receiver(pre_save, sender=DepartmentCourse)
+def remember_previous_dept(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        previous = sender.objects.filter(pk=instance.pk).values('dept_id', 'teacher_id', 'course').first() or {}
+        instance._previous_dept_id = previous.get('dept_id')
+        instance._previous_teacher_id = previous.get('teacher_id')
+        instance._previous_course = previous.get('course')
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=DepartmentCourse)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=DepartmentCourse)
+def invalidate_department_roster(sender, instance, **kwargs):
+    invalidate_rosters([instance.dept_id, getattr(instance, '_previous_dept_id', None)])
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def invalidate_schedule_rows(sender, instance, **kwargs):
+    invalidate_teacher_rows([instance.teacher_id, getattr(instance, '_previous_teacher_id', None)])
+
+
+@receiver(post_save, sender=DepartmentCourse)
+@receiver(post_delete, sender=DepartmentCourse)
+def link_schedules(sender, instance, raw=False, **kwargs):
+    # Schedules by this name, and by its name before a rename, follow the
+    # course through renames, deletes and earlier semesters being added
+    if raw:
+        return
+    previous = (getattr(instance, '_previous_dept_id', None), getattr(instance, '_previous_course', None))
+    teacher_ids = set()
+    for dept_id, course in {(instance.dept_id, instance.course), previous}:
+        teacher_ids |= DepartmentCourse.relink(dept_id, course)
+    invalidate_teacher_rows(teacher_ids)
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def invalidate_teacher_rosters(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_version('teachers')
+
+
+@receiver(post_save, sender=Teacher)
+def invalidate_teacher_name_rows(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_teacher_rows([instance.pk])
+
+
+# The timetable API answers conditional GETs from this version stamp.
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Dept)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Dept)
+def bump_timetable(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which the timetable does not show
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_version('timetable')
+
+
+# Calendar feeds also show department meetings and approved leave.
+
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+def bump_meetings(sender, instance, **kwargs):
+    # Dashboards only show meetings from the teacher's own department
+    bump_version('meetings', department_meetings_scope(_meeting_department(instance)))
+
+
+def _meeting_department(meeting):
+    if Meeting.created_by.is_cached(meeting):
+        return meeting.created_by.department
+    return Teacher.objects.filter(pk=meeting.created_by_id).values_list('department', flat=True).first()
+
+
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def bump_leave(sender, instance, **kwargs):
+    bump_version('leave')
+
+
+# Live updates for the department event streams, sent once committed
+
+@receiver(post_save, sender=Meeting)
+def publish_meeting(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    department = (_meeting_department(instance) or '').upper()
+    data = {
+        'id': instance.pk,
+        'date': str(instance.date),
+        'time': str(instance.time)[:5],
+        'venue': instance.venue,
+    }
+    transaction.on_commit(lambda: events.broker.publish(department, 'meeting', data))
+
+
+@receiver(pre_save, sender=LeaveRequest)
+def remember_previous_status(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.pk or (update_fields is not None and 'status' not in update_fields):
+        return
+    instance._previous_status = sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=LeaveRequest)
+def publish_leave(sender, instance, created=False, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_status', None)
+    if raw or (not created and previous in (None, instance.status)):
+        return
+    teacher = Teacher.objects.filter(pk=instance.teacher_id).values(
+        'department', 'username', 'first_name', 'last_name'
+    ).first()
+    if teacher is None:
+        return
+    data = {
+        'id': instance.pk,
+        'teacher_id': instance.teacher_id,
+        'teacher': f"{teacher['first_name']} {teacher['last_name']}".strip() or teacher['username'],
+        'date': str(instance.date),
+        'status': instance.status,
+    }
+    department = teacher['department'].upper()
+    transaction.on_commit(lambda: events.broker.publish(department, 'leave', data))
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+# Profile picture thumbnails are written after the upload has committed,
+# on the thumbnail thread, so the request never waits for the resize.
+
+@receiver(pre_save, sender=Teacher)
+def remember_previous_teacher(sender, instance, raw=False, update_fields=None, **kwargs):
+    fields = [f for f in ('profile_picture', 'department') if update_fields is None or f in update_fields]
+    if raw or not instance.pk or not fields:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+    if 'profile_picture' in fields:
+        instance._previous_picture = previous.get('profile_picture') or ''
+    if 'department' in fields:
+        instance._previous_department = previous.get('department')
+
+
+@receiver(post_save, sender=Teacher)
+def refresh_thumbnails(sender, instance, raw=False, created=False, **kwargs):
+    old = instance.__dict__.pop('_previous_picture', None)
+    if raw or (old is None and not created):
+        return
+    new = instance.profile_picture.name or ''
+    if old == new:
+        return
+    if old:
+        transaction.on_commit(lambda: thumbnails.schedule(thumbnails.delete_thumbnails, old))
+    if new:
+        transaction.on_commit(lambda: thumbnails.schedule(thumbnails.generate_thumbnails, new))
+
+
+@receiver(post_save, sender=Teacher)
+def move_department_meetings(sender, instance, raw=False, **kwargs):
+    # Meetings follow their creator's department
+    previous = instance.__dict__.pop('_previous_department', None)
+    if not raw and previous is not None and previous != instance.department:
+        bump_version(department_meetings_scope(previous), department_meetings_scope(instance.department))
+
+
+@receiver(post_delete, sender=Teacher)
+def drop_thumbnails(sender, instance, **kwargs):
+    if instance.profile_picture:
+        name = instance.profile_picture.name
+        transaction.on_commit(lambda: thumbnails.schedule(thumbnails.delete_thumbnails, name))
+
+
+@receiver(post_save, sender=Dept)
+@receiver(post_delete, sender=Dept)
+def forget_dept_id(sender, instance, **kwargs):
+    cache.delete(f'dept-id:{instance.name}')
@@ -0,0 +1,140 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import Lower, Trim
+
+from .caching import get_versions
+from .models import DepartmentCourse, LeaveRequest, Meeting, Schedule, Teacher, TimetableSlot
+from .occupancy import IntervalIndex, _label, _minutes
+
+
+SUBSTITUTE_SCOPES = ('timetable', 'leave', 'meetings', 'teachers')
+SUBSTITUTE_CACHE_TIMEOUT = 60 * 10
+MAX_CANDIDATES = 5
+
+
+def _name(teacher):
+    return f'{teacher.first_name} {teacher.last_name}'.strip() or teacher.username
+
+
+def _classes_on(dept_name, on_date):
+    """(schedule_id, teacher_id, course, room, start, end) for each class the department teaches on ``on_date``."""
+    # Weekly classes that weekday and one-off classes on that date
+    return list(
+        TimetableSlot.objects.filter(teacher__department=dept_name, weekday=on_date.weekday())
+        .filter(Q(date=None) | Q(date=on_date))
+        .values_list('schedule_id', 'teacher_id', 'course', 'room', 'start_time', 'end_time')
+        .distinct()
+    )
+
+
+def _known_courses(dept_name, courses):
+    """{teacher_id: {course keys}} for the ``courses`` (lower-cased, stripped) each teacher teaches or is assigned to."""
+    known = defaultdict(set)
+    course_key = Lower(Trim('course'))
+    for model, dept_filter in ((Schedule, 'teacher__department'), (DepartmentCourse, 'dept__name')):
+        rows = (
+            model.objects.annotate(course_key=course_key)
+            .filter(**{dept_filter: dept_name}, course_key__in=courses, teacher__isnull=False)
+            .values_list('teacher_id', 'course_key').distinct()
+        )
+        for teacher_id, key in rows:
+            known[teacher_id].add(key)
+    return known
+
+
+def build_suggestions(dept_name, on_date):
+    """
+    Ranked substitutes for every class whose teacher has approved leave on ``on_date``.
+
+    Each teacher's classes that day go into an IntervalIndex, so checking a
+    candidate is a bisect. Candidates who already teach the course come
+    first, then those with the fewest classes (counting substitutions
+    already suggested in this pass), then by name.
+    """
+    names = {
+        t.pk: _name(t) for t in Teacher.objects.filter(department=dept_name, is_superuser=False, is_active=True)
+        .only('username', 'first_name', 'last_name')
+    }
+    absent = set(LeaveRequest.objects.filter(
+        teacher__in=names, date=on_date, status='approved',
+    ).values_list('teacher_id', flat=True))
+    if not absent:
+        return []
+
+    busy = defaultdict(IntervalIndex)
+    load = defaultdict(int)
+    uncovered = []
+    for schedule_id, teacher_id, course, room, start_time, end_time in _classes_on(dept_name, on_date):
+        start, end = _minutes(start_time), _minutes(end_time)
+        busy[teacher_id].add(start, end, schedule_id)
+        load[teacher_id] += 1
+        if teacher_id in absent:
+            uncovered.append((start, end, schedule_id, teacher_id, course, room))
+
+    # A department meeting keeps everyone busy
+    length = getattr(settings, 'MEETING_DURATION_MINUTES', 60)
+    meetings = IntervalIndex()
+    for at in Meeting.objects.filter(created_by__department=dept_name, date=on_date).values_list('time', flat=True):
+        meetings.add(_minutes(at), _minutes(at) + length, None)
+
+    known = _known_courses(dept_name, {course.strip().lower() for _, _, _, _, course, _ in uncovered})
+    available = [pk for pk in names if pk not in absent]
+    sort_names = {pk: name.lower() for pk, name in names.items()}
+    # Absent teachers' classes mostly share the same periods: look each
+    # period up once, then recheck only teachers already given cover
+    free_at = {}
+    covering = set()
+    suggestions = []
+    for start, end, schedule_id, teacher_id, course, room in sorted(uncovered):
+        course_key = course.strip().lower()
+        if (start, end) not in free_at:
+            free_at[start, end] = [] if meetings.overlapping(start, end) else [
+                pk for pk in available if pk not in busy or not busy[pk].overlapping(start, end)
+            ]
+        free = [
+            pk for pk in free_at[start, end]
+            if pk not in covering or not busy[pk].overlapping(start, end)
+        ]
+        free = heapq.nsmallest(
+            MAX_CANDIDATES, free, key=lambda pk: (course_key not in known[pk], load[pk], sort_names[pk]),
+        )
+        suggestions.append({
+            'schedule_id': schedule_id,
+            'course': course,
+            'room': room,
+            'start': _label(start),
+            'end': _label(end),
+            'absent': {'id': teacher_id, 'name': names[teacher_id]},
+            'candidates': [
+                {
+                    'id': pk,
+                    'name': names[pk],
+                    'teaches_course': course_key in known[pk],
+                    'classes_today': load[pk],
+                }
+                for pk in free
+            ],
+        })
+        if free:
+            # Spread cover: the top pick is now busy then and has one more class
+            busy[free[0]].add(start, end, schedule_id)
+            load[free[0]] += 1
+            covering.add(free[0])
+    return suggestions
+
+
+def substitute_suggestions(dept_name, on_date):
+    """build_suggestions, cached until schedules, leave, meetings or teachers change."""
+    versions = get_versions(SUBSTITUTE_SCOPES)
+    key = 'substitutes:{}:{}:{}'.format(
+        dept_name, on_date.isoformat(), ':'.join(str(versions[scope]) for scope in SUBSTITUTE_SCOPES),
+    )
+    found = cache.get(key)
+    if found is None:
+        found = build_suggestions(dept_name, on_date)
+        cache.set(key, found, SUBSTITUTE_CACHE_TIMEOUT)
+    return found
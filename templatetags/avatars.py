@@ -0,0 +1,31 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from ..thumbnails import THUMBNAIL_SIZES, thumbnail_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar(teacher, size, default, css_class='', alt='Profile Picture'):
+    """
+    Lazy-loaded WebP thumbnail of a teacher's picture, at ``size`` and 2x.
+
+    Until the background job has written the thumbnails the browser falls
+    back to the original upload.
+    """
+    if not teacher.profile_picture:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" width="{}" height="{}" loading="lazy" decoding="async">',
+            static(default), alt, css_class, size, size,
+        )
+    name = teacher.profile_picture.name
+    srcset = f'{thumbnail_url(name, size)} 1x'
+    if size * 2 in THUMBNAIL_SIZES:
+        srcset += f', {thumbnail_url(name, size * 2)} 2x'
+    return format_html(
+        '<img src="{}" srcset="{}" alt="{}" class="{}" width="{}" height="{}" loading="lazy" decoding="async" '
+        'data-original="{}" onerror="this.onerror=null;this.removeAttribute(\'srcset\');this.src=this.dataset.original">',
+        thumbnail_url(name, size), srcset, alt, css_class, size, size, teacher.profile_picture.url,
+    )
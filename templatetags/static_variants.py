@@ -0,0 +1,59 @@
+from urllib.parse import quote, urljoin
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+_variants = None
+
+
+def variants_for(path):
+    """WebP/AVIF variants written by collectstatic, smallest first; [] before it has run."""
+    global _variants
+    if _variants is None:
+        # Only changes on deploy, so read it once per process
+        load = getattr(staticfiles_storage, 'load_variants', None)
+        _variants = load() if load else {}
+    return _variants.get(path, [])
+
+
+def _url(name):
+    # Variant names are already hashed and are not in staticfiles.json
+    return urljoin(staticfiles_storage.base_url, quote(name))
+
+
+def _by_format(path):
+    formats = {}
+    for variant in variants_for(path):
+        formats.setdefault(variant['format'], []).append(variant)
+    return formats
+
+
+@register.simple_tag
+def image_srcset(path, fmt):
+    return ', '.join(f"{_url(v['name'])} {v['width']}w" for v in _by_format(path).get(fmt, []))
+
+
+@register.simple_tag
+def image_set(path):
+    """CSS image-set() of the largest variant in each format, then the original."""
+    options = [
+        format_html('url("{}") type("image/{}")', _url(variants[-1]['name']), fmt)
+        for fmt, variants in _by_format(path).items()
+    ]
+    options.append(format_html('url("{}")', static(path)))
+    return format_html('image-set({})', format_html_join(', ', '{}', ((option,) for option in options)))
+
+
+@register.simple_tag
+def static_picture(path, alt='', sizes='100vw', **attrs):
+    """<picture> with AVIF/WebP sources falling back to the original file."""
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, image_srcset(path, fmt), sizes) for fmt in _by_format(path)),
+    )
+    extra = format_html_join('', ' {}="{}"', ((key.replace('_', '-'), value) for key, value in attrs.items()))
+    return format_html('<picture>{}<img src="{}" alt="{}"{}></picture>', sources, static(path), alt, extra)
@@ -1,3 +1,1364 @@
-from django.test import TestCase
+import gzip
+import json
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import addModuleCleanup, mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.db.models.signals import post_save
+from django.forms import modelform_factory
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+
+from . import async_views, caching, events, ical, mailer, occupancy, roster, search, substitutes, thumbnails, timetable
+from .assets import StaticAssetMiddleware
+from .forms import MeetingForm
+from .metrics import REGISTRY, QueryMetricsMiddleware
+from .models import (
+    TEACHER_ID_MAX_LENGTH, Dept, DepartmentCourse, LeaveRequest, Meeting, OutboxEmail, Schedule, Teacher,
+    TeacherIdSequence, TimetableSlot, assign_teacher_ids, check_teacher_id_length, format_teacher_id,
+)
+from .occupancy import IntervalIndex
+from .pagination import MAX_PAGE_SIZE, SCHEDULE_ORDERING, SCHEDULE_PAGE_SIZE, encode_cursor, page_size_from
+from .purge import purge_expired
+from .routers import PRIMARY_PIN_COOKIE, REPLICA, ReplicaRouter, ReplicaRoutingMiddleware
+from .templatetags import static_variants
+
+
+def setUpModule():
+    # The file cache outlives the test database, so start from an empty one
+    directory = tempfile.TemporaryDirectory()
+    settings_override = override_settings(CACHES={
+        'default': {**settings.CACHES['default'], 'LOCATION': directory.name},
+    })
+    settings_override.enable()
+    addModuleCleanup(directory.cleanup)
+    addModuleCleanup(settings_override.disable)
+
+
+# SEARCH is an index lookup; every SCAN (of a table, an index or a covering
+# index) walks the whole thing, so each test must list the ones it accepts.
+SCAN_RE = re.compile(r'\bSCAN \S.*')
+
+
+class QueryPlanTests(TestCase):
+    """Every query the main views issue must be answered from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        today = now().date()
+        cls.bim = Dept.objects.create(name='BIM')
+        cls.teacher = Teacher.objects.create_user(
+            'ann', password='secret', first_name='Ann', last_name='Lee', department='BIM',
+        )
+        other = Teacher.objects.create_user('bob', password='secret', first_name='Bob', department='BIM')
+        DepartmentCourse.objects.create(dept=cls.bim, semester=3, course='Databases', teacher=cls.teacher)
+        for hour, (course, teacher) in enumerate([('Databases', cls.teacher), ('Networks', other)], start=8):
+            Schedule.objects.create(
+                course=course, teacher=teacher, dept=cls.bim, day='Sunday',
+                start_time=time(hour), end_time=time(hour + 1), room='R1',
+            )
+        Meeting.objects.create(created_by=other, date=today, time=time(14), venue='Hall')
+        Meeting.objects.create(created_by=other, date=today + timedelta(days=3), time=time(14), venue='Hall')
+        LeaveRequest.objects.create(teacher=other, date=today, status='approved')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.teacher)
+
+    def assertNoFullScans(self, url, data=None, allow=()):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200, url)
+
+        for query in captured.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+            scans = [scan for scan in SCAN_RE.findall(plan) if scan not in allow]
+            self.assertFalse(scans, f"{url} scans {', '.join(scans)}:\n{sql}\n{plan}")
+
+    def test_index(self):
+        self.assertNoFullScans(reverse('index'))
+
+    # The first page reads the keyset index in order and stops at the page size
+    FIRST_PAGE = 'SCAN home_schedule USING INDEX schedule_keyset_idx'
+
+    def test_schedule(self):
+        self.assertNoFullScans(reverse('schedule'), allow={self.FIRST_PAGE})
+
+    def test_schedule_next_page(self):
+        response = self.client.get(reverse('schedule_json'), {'page_size': 1})
+        self.assertNoFullScans(reverse('schedule_json'), {'page_size': 1, 'cursor': response.json()['next_cursor']})
+
+    def test_schedule_search(self):
+        # FTS5 answers MATCH from its own index
+        self.assertNoFullScans(reverse('schedule'), {'q': 'data'}, allow={
+            self.FIRST_PAGE, 'SCAN home_search VIRTUAL TABLE INDEX 0:M2',
+        })
+
+    def test_department_detail(self):
+        self.assertNoFullScans(reverse('department_detail', args=['bim']))
+
+    def test_teacher_list(self):
+        # Lists every teacher, read in order from the staff index
+        self.assertNoFullScans(reverse('teacher_list'), allow={'SCAN home_teacher USING INDEX teacher_staff_idx'})
+
+    def test_create_meeting(self):
+        self.assertNoFullScans(reverse('create_meeting'))
+
+    def test_leave_request(self):
+        self.assertNoFullScans(reverse('leave_request'))
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seed_and_benchmark(self):
+        call_command('seed_data', scale=0.01, stdout=StringIO())
+        self.assertEqual(Schedule.objects.count(), 200)
+        # Seeded rows never clash, so every one passes model validation
+        for schedule in Schedule.objects.all()[:20]:
+            schedule.clean()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = Path(tmp) / 'baseline.json'
+            call_command('benchmark_views', repeat=2, warmup=0, baseline=str(baseline),
+                         save_baseline=True, stdout=StringIO())
+            results = json.loads(baseline.read_text())['results']
+            self.assertIn('department_detail:bim', results)
+            self.assertEqual(set(results['index']), {'p50_ms', 'p95_ms', 'queries', 'peak_kib'})
+
+            out = StringIO()
+            call_command('benchmark_views', repeat=2, warmup=0, baseline=str(baseline), tolerance=100, stdout=out)
+            self.assertIn('index: ok', out.getvalue())
+
+
+class CachedAuthTests(TestCase):
+    """Logged-in requests read the session and user from the cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = Teacher.objects.create_user('ann', password='secret', first_name='Ann', department='BIM')
+        self.client.login(username='ann', password='secret')
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [
+            q['sql'] for q in captured.captured_queries
+            if 'django_session' in q['sql'] or 'WHERE "home_teacher"."id" =' in q['sql']
+        ]
+
+    def test_warm_requests_skip_auth_queries(self):
+        self.client.get(reverse('teacher_list'))
+        self.assertEqual(self.auth_queries(reverse('teacher_list')), [])
+
+    def test_profile_edit_refreshes_user(self):
+        self.client.get(reverse('teacher_list'))
+        teacher = Teacher.objects.get(pk=self.teacher.pk)
+        teacher.username = 'anna'
+        teacher.save()
+        self.assertContains(self.client.get(reverse('profile')), 'anna')
+
+        teacher.set_password('changed')
+        teacher.save()
+        self.assertEqual(self.client.get(reverse('teacher_list')).status_code, 302)
+
+    def test_logout_forgets_session(self):
+        self.client.get(reverse('teacher_list'))
+        session_key = self.client.session.session_key
+        self.client.get(reverse('logout'))
+        self.assertIsNone(cache.get(f'django.contrib.sessions.cached_db{session_key}'))
+        self.assertEqual(self.client.get(reverse('teacher_list')).status_code, 302)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = Teacher.objects.create_user('ann', password='secret', department='BIM')
+        self.colleague = Teacher.objects.create_user('bob', password='secret', department='BIM')
+        self.client.login(username='ann', password='secret')
+
+    def test_warm_index_runs_no_queries(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('index')).status_code, 200)
+
+    def test_department_meeting_refreshes_dashboard(self):
+        self.client.get(reverse('index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Meeting.objects.create(created_by=self.colleague, date=now().date(), time=time(14), venue='Hall')
+        self.assertContains(self.client.get(reverse('index')), 'Hall')
+
+
+class RosterCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bim = Dept.objects.create(name='BIM')
+        self.ann = Teacher.objects.create_user('ann', first_name='Ann', department='BIM')
+        Schedule.objects.create(
+            course='Databases', teacher=self.ann, dept=self.bim, day='Sunday',
+            start_time=time(8), end_time=time(9), room='R1',
+        )
+
+    def courses(self):
+        return [course['name'] for entry in roster.department_roster('BIM') for course in entry['courses']]
+
+    def test_reads_before_commit_are_not_cached_past_it(self):
+        committed = roster.build_roster(self.bim.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Schedule.objects.create(
+                course='Networks', teacher=self.ann, dept=self.bim, day='Monday',
+                start_time=time(8), end_time=time(9), room='R2',
+            )
+            # Other connections still read the committed rows until this commits
+            with mock.patch.object(roster, 'build_roster', return_value=committed):
+                self.assertEqual(self.courses(), ['Databases'])
+        self.assertEqual(self.courses(), ['Databases', 'Networks'])
+
+    def test_roster_is_grouped_and_searched_in_one_query(self):
+        bob = Teacher.objects.create_user('bob', first_name='Bob', department='BIM')
+        DepartmentCourse.objects.create(dept=self.bim, semester=3, course='Databases')
+        for teacher, course, day in ((self.ann, 'Databases', 'Monday'), (self.ann, 'Networks', 'Sunday'),
+                                     (bob, 'Databases', 'Tuesday')):
+            Schedule.objects.create(course=course, teacher=teacher, dept=self.bim, day=day,
+                                    start_time=time(10), end_time=time(11), room='R1')
+        ann = {'id': self.ann.pk, 'username': 'ann', 'first_name': 'Ann', 'last_name': ''}
+        with self.assertNumQueries(1):
+            self.assertEqual(roster.build_roster(self.bim.pk), [
+                {'teacher': ann, 'courses': [
+                    {'name': 'Networks', 'semester': 'N/A', 'sessions': 1},
+                    {'name': 'Databases', 'semester': 3, 'sessions': 2},
+                ]},
+                {'teacher': {'id': bob.pk, 'username': 'bob', 'first_name': 'Bob', 'last_name': ''}, 'courses': [
+                    {'name': 'Databases', 'semester': 3, 'sessions': 1},
+                ]},
+            ])
+        with self.assertNumQueries(1):
+            self.assertEqual([entry['teacher'] for entry in roster.build_roster(self.bim.pk, 'AN')], [ann])
+        # Each search is cached apart from the full roster
+        roster.department_roster('BIM')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(roster.department_roster('BIM', 'bo')), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(roster.department_roster('BIM', 'BO')), 1)
+            self.assertEqual(len(roster.department_roster('BIM')), 2)
+
+    def page(self, dept='bim'):
+        self.client.force_login(self.ann)
+        return self.client.get(reverse('department_detail', args=[dept])).content.decode()
+
+    def test_teacher_edits_refresh_roster_and_rows(self):
+        self.assertIn('Ann </td>', self.page())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ann.first_name = 'Anna'
+            self.ann.save()
+        html = self.page()
+        self.assertIn('Anna </td>', html)
+        self.assertNotIn('Ann </td>', html)
+
+    def test_schedule_edits_refresh_roster_and_rows(self):
+        schedule = Schedule.objects.get()
+        self.assertIn('<td>Databases</td>', self.page())
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule.course = 'Data Mining'
+            schedule.save()
+        html = self.page()
+        self.assertIn('<td>Data Mining</td>', html)
+        self.assertNotIn('<td>Databases</td>', html)
+
+        # Moving it to another department empties this one
+        bca = Dept.objects.create(name='BCA')
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule.dept = bca
+            schedule.save()
+        self.assertIn('No matching teacher found.', self.page())
+        self.assertIn('<td>Data Mining</td>', self.page('bca'))
+
+    def test_course_edits_refresh_semesters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = DepartmentCourse.objects.create(dept=self.bim, semester=3, course='Databases')
+        self.assertIn('<td>3</td>', self.page())
+        with self.captureOnCommitCallbacks(execute=True):
+            course.semester = 4
+            course.save()
+        self.assertIn('<td>4</td>', self.page())
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        self.assertIn('<td>N/A</td>', self.page())
+
+
+class CourseLinkTests(TestCase):
+    def setUp(self):
+        self.bim = Dept.objects.create(name='BIM')
+        self.bca = Dept.objects.create(name='BCA')
+        self.schedules = [
+            Schedule.objects.create(course=course, dept=dept, day='Sunday', start_time=time(8), end_time=time(9), room=room)
+            for course, dept, room in (('Databases', self.bim, 'R1'), (' databases ', self.bim, 'R2'),
+                                       ('Databases', self.bca, 'R3'))
+        ]
+
+    def links(self):
+        return [Schedule.objects.get(pk=s.pk).department_course for s in self.schedules]
+
+    def test_match_ignores_case_and_spaces_and_takes_the_earliest_semester(self):
+        DepartmentCourse.objects.create(dept=self.bim, semester=5, course='Databases')
+        third = DepartmentCourse.objects.create(dept=self.bim, semester=3, course='DATABASES ')
+        self.assertEqual(DepartmentCourse.match(self.bim.pk, ' databases'), third)
+        self.assertIsNone(DepartmentCourse.match(self.bca.pk, 'Databases'))
+        self.assertIsNone(DepartmentCourse.match(self.bim.pk, ''))
+        self.assertIsNone(DepartmentCourse.match(None, 'Databases'))
+
+    def test_schedules_follow_courses_through_renames_and_deletes(self):
+        fifth = DepartmentCourse.objects.create(dept=self.bim, semester=5, course='Databases')
+        self.assertEqual(self.links(), [fifth, fifth, None])
+        third = DepartmentCourse.objects.create(dept=self.bim, semester=3, course='databases')
+        self.assertEqual(self.links(), [third, third, None])
+        third.course = 'Networks'
+        third.save()
+        self.assertEqual(self.links(), [fifth, fifth, None])
+        fifth.dept = self.bca
+        fifth.save()
+        self.assertEqual(self.links(), [None, None, fifth])
+        fifth.delete()
+        self.assertEqual(self.links(), [None, None, None])
+
+    def test_migration_backfills_links(self):
+        third = DepartmentCourse.objects.create(dept=self.bim, semester=3, course='Databases')
+        DepartmentCourse.objects.create(dept=self.bim, semester=1, course='Networks')
+        DepartmentCourse.objects.create(dept=self.bim, semester=5, course='databases')
+        Schedule.objects.update(department_course=None)
+        migration = import_module('home.migrations.0016_schedule_department_course')
+        migration.link_department_courses(apps, None)
+        self.assertEqual(self.links(), [third, third, None])
+
+
+@override_settings(ROOT_URLCONF='llms.asgi_urls')
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Dept.objects.create(name='BIM')
+        self.teacher = Teacher.objects.create_user('ann', password='secret', department='BIM')
+
+    async def test_asgi_urlconf_serves_async_views(self):
+        await self.async_client.aforce_login(self.teacher)
+        for url, view in (
+            (reverse('index'), async_views.index),
+            (reverse('schedule'), async_views.schedule),
+            (reverse('department_detail', args=['bim']), async_views.department_detail),
+        ):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIs(response.resolver_match.func, view)
+
+    async def test_admin_index_is_not_replaced(self):
+        response = await self.async_client.get(reverse('admin:index'))
+        self.assertRedirects(
+            response, reverse('admin:login') + '?next=' + reverse('admin:index'), fetch_redirect_response=False,
+        )
+
+    async def test_queries_from_async_views_are_recorded(self):
+        await self.async_client.aforce_login(self.teacher)
+        with mock.patch.object(REGISTRY, 'observe') as observe:
+            await self.async_client.get(reverse('schedule'))
+        route, _, stats = observe.call_args.args
+        self.assertEqual(route, 'schedule')
+        self.assertGreaterEqual(stats.sql_count, 1)
+
+    def test_middlewares_stay_async(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        for middleware in (StaticAssetMiddleware, QueryMetricsMiddleware, ReplicaRoutingMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware(get_response)), middleware)
+            self.assertFalse(iscoroutinefunction(middleware(lambda request: HttpResponse())), middleware)
+
+
+class SchedulePaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create_user('ann', password='secret', department='BIM')
+        bim = Dept.objects.create(name='BIM')
+        # Five rows share (dept, day, start_time) and two have no department
+        for n, dept in enumerate([bim] * 5 + [None] * 2):
+            Schedule.objects.create(
+                course=f'Course {n}', teacher=Teacher.objects.create_user(f't{n}', department='BIM'), dept=dept,
+                day='Sunday', start_time=time(9), end_time=time(10), room=f'R{n}',
+            )
+        cls.expected = list(Schedule.objects.order_by(*SCHEDULE_ORDERING).values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.teacher)
+
+    def pages(self, page_size):
+        pages, cursor = [], None
+        while True:
+            data = {'page_size': page_size, **({'cursor': cursor} if cursor else {})}
+            body = self.client.get(reverse('schedule_json'), data).json()
+            pages.append([row['id'] for row in body['results']])
+            cursor = body['next_cursor']
+            if cursor is None:
+                return pages
+
+    def test_pages_split_ties_and_null_depts(self):
+        self.assertIsNone(Schedule.objects.get(pk=self.expected[0]).dept_id)
+        for size in (1, 2, 3, 7):
+            pages = self.pages(size)
+            self.assertEqual([pk for page in pages for pk in page], self.expected, size)
+            self.assertEqual(len(pages), -(-len(self.expected) // size), size)
+
+    def test_tampered_cursor_starts_again(self):
+        for cursor in ('not-a-cursor', encode_cursor(Schedule(day='Sunday', start_time=time(9), id=1))[:-3]):
+            response = self.client.get(reverse('schedule'), {'cursor': cursor, 'page_size': 2})
+            self.assertEqual([s.id for s in response.context['schedules']], self.expected[:2])
+            self.assertTrue(response.context['is_first_page'])
+            self.assertNotContains(response, 'First page')
+            self.assertEqual(self.client.get(reverse('schedule_json'), {'cursor': cursor}).status_code, 400)
+
+    def test_links_keep_page_size(self):
+        response = self.client.get(reverse('schedule'), {'page_size': 2})
+        cursor = response.context['next_cursor']
+        self.assertContains(response, f'href="?q=&page_size=2&cursor={cursor}"')
+        response = self.client.get(reverse('schedule'), {'page_size': 2, 'cursor': cursor})
+        self.assertContains(response, 'href="?q=&page_size=2">&laquo; First page')
+
+    def test_page_size_is_clamped(self):
+        self.assertEqual(page_size_from('0'), 1)
+        self.assertEqual(page_size_from('100000'), MAX_PAGE_SIZE)
+        self.assertEqual(page_size_from('lots'), SCHEDULE_PAGE_SIZE)
+        body = self.client.get(reverse('schedule_json'), {'page_size': 0}).json()
+        self.assertEqual(len(body['results']), 1)
+        body = self.client.get(reverse('schedule_json'), {'page_size': 100000}).json()
+        self.assertEqual(len(body['results']), len(self.expected))
+        self.assertIsNone(body['next_cursor'])
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bim = Dept.objects.create(name='BIM')
+        self.ann = Teacher.objects.create_user('ann', password='secret', first_name='Ann', last_name='Lee', department='BIM')
+        self.databases = Schedule.objects.create(
+            course='Databases', teacher=self.ann, dept=self.bim, day='Sunday',
+            start_time=time(9), end_time=time(10), room='R1',
+        )
+        self.course = DepartmentCourse.objects.create(dept=self.bim, semester=3, course='Databases', teacher=self.ann)
+
+    def matches(self, model, kind, query):
+        return list(model.objects.filter(pk__in=search.matching(kind, query)).values_list('pk', flat=True))
+
+    def test_signals_keep_documents_current(self):
+        self.assertEqual(self.matches(Schedule, search.SCHEDULE, 'datab'), [self.databases.pk])
+        self.ann.last_name = 'Park'
+        self.ann.save()
+        self.assertEqual(self.matches(Schedule, search.SCHEDULE, 'park'), [self.databases.pk])
+        self.assertEqual(self.matches(DepartmentCourse, search.COURSE, 'park'), [self.course.pk])
+        self.assertEqual(self.matches(Schedule, search.SCHEDULE, 'lee'), [])
+        self.databases.delete()
+        self.assertEqual(self.matches(Schedule, search.SCHEDULE, 'datab'), [])
+
+    def test_matches_keep_timetable_order(self):
+        Schedule.objects.create(
+            course='Data Mining and Data Warehousing', dept=self.bim, day='Monday',
+            start_time=time(8), end_time=time(9), room='R1',
+        )
+        self.client.force_login(self.ann)
+        results = self.client.get(reverse('schedule_json'), {'q': 'data'}).json()['results']
+        expected = list(Schedule.objects.order_by(*SCHEDULE_ORDERING).values_list('pk', flat=True))
+        self.assertEqual([row['id'] for row in results], expected)
+
+    def test_login_leaves_index_alone(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertTrue(self.client.login(username='ann', password='secret'))
+        self.assertFalse([q['sql'] for q in captured.captured_queries if 'home_search' in q['sql']])
+
+    def test_search_pages_through_every_match(self):
+        self.client.force_login(self.ann)
+        for n in range(3):
+            Schedule.objects.create(
+                course='Databases', dept=self.bim, day='Monday', start_time=time(9), end_time=time(10), room=f'L{n}',
+            )
+        ids, cursor = [], None
+        while True:
+            body = self.client.get(reverse('schedule_json'), {
+                'q': 'datab', 'page_size': 2, **({'cursor': cursor} if cursor else {}),
+            }).json()
+            ids += [row['id'] for row in body['results']]
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(ids), sorted(Schedule.objects.values_list('pk', flat=True)))
+
+    def test_admin_keeps_substring_and_department_matches(self):
+        admin_user = Teacher.objects.create_superuser('root', 'root@example.com', 'secret')
+        self.client.force_login(admin_user)
+        teachers = self.client.get(reverse('admin:home_teacher_changelist'), {'q': 'BIM'})
+        self.assertEqual(teachers.context['cl'].result_count, 1)
+        courses = self.client.get(reverse('admin:home_departmentcourse_changelist'), {'q': 'atabases'})
+        self.assertEqual(courses.context['cl'].result_count, 1)
+        # The index ignores accents, which icontains does not
+        Teacher.objects.create_user('jd', first_name='Jos\u00e9', department='BIM')
+        teachers = self.client.get(reverse('admin:home_teacher_changelist'), {'q': 'jose'})
+        self.assertEqual(teachers.context['cl'].result_count, 1)
+
+
+class FailingBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('mail server said no')
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        ann = Teacher.objects.create_user('ann', email='ann@example.com', department='BIM')
+        Teacher.objects.create_user('bob', email='bob@example.com', department='BIM')
+        Teacher.objects.create_user('cat', email='cat@example.com', department='BBA')
+        meeting = Meeting.objects.create(created_by=ann, date=now().date(), time=time(14), venue='Hall')
+        mailer.queue_meeting_notice(meeting)
+
+    def test_queue_and_deliver(self):
+        self.assertEqual(set(OutboxEmail.objects.values_list('recipient', flat=True)), {'ann@example.com', 'bob@example.com'})
+        self.assertEqual(mailer.deliver_pending(), (2, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['ann@example.com', 'bob@example.com'])
+        self.assertFalse(OutboxEmail.objects.exclude(status='sent').exists())
+        self.assertEqual(mailer.deliver_pending(), (0, 0))
+
+    def test_claimed_messages_are_hidden_from_other_workers(self):
+        claimed = mailer._claim(10)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(mailer._claim(10), [])
+
+    def test_contended_claim_is_rolled_back_and_retried(self):
+        first = OutboxEmail.objects.order_by('pk').first()
+        filter_ = OutboxEmail.objects.filter
+        claims = []
+
+        def other_worker_claims_first(*args, **kwargs):
+            if 'pk__in' in kwargs:
+                claims.append(kwargs['pk__in'])
+                if len(claims) == 1:
+                    # Lands between our read and our UPDATE
+                    OutboxEmail._base_manager.filter(pk=first.pk).update(next_attempt_at=now() + timedelta(hours=1))
+            return filter_(*args, **kwargs)
+
+        with mock.patch.object(OutboxEmail.objects, 'filter', side_effect=other_worker_claims_first):
+            claimed = mailer._claim(10)
+        # The short UPDATE was rolled back (taking the other write with it
+        # here, as both share the test transaction) and the claim re-read
+        self.assertEqual(len(claims), 2)
+        self.assertEqual(len(claimed), 2)
+
+    def test_failures_back_off_then_give_up(self):
+        self.assertEqual(mailer.deliver_pending(connection=FailingBackend(), retry_base=60), (0, 2))
+        item = OutboxEmail.objects.first()
+        self.assertEqual((item.status, item.attempts), ('pending', 1))
+        self.assertIn('said no', item.last_error)
+        self.assertGreater(item.next_attempt_at, now() + timedelta(seconds=50))
+        self.assertEqual(mailer.deliver_pending(), (0, 0))
+
+        OutboxEmail.objects.update(next_attempt_at=now())
+        mailer.deliver_pending(connection=FailingBackend(), max_attempts=2)
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', flat=True)), {'failed'})
+        self.assertEqual(mail.outbox, [])
+
+
+class ImportTimetableTests(TestCase):
+    HEADER = 'course,teacher,dept,day,start_time,end_time,room\n'
+
+    def setUp(self):
+        Dept.objects.create(name='BIM')
+        Teacher.objects.create_user('ann', department='BIM')
+        Schedule.objects.create(course='Existing', day='Monday', start_time=time(8), end_time=time(9), room='R9')
+
+    def run_import(self, rows, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'timetable.csv'
+            path.write_text(self.HEADER + ''.join(f'{row}\n' for row in rows))
+            out, err = StringIO(), StringIO()
+            call_command('import_timetable', str(path), stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        out, err = self.run_import([
+            'Databases,ann,bim,Sunday,09:00,10:00,R1',
+            'Networks,ann,bim,Sunday,09:30,10:30,R2',  # teacher busy
+            'Graphics,,bim,sunday,09:45,10:15,r1',  # room busy
+            'Physics,zed,bim,Monday,09:00,10:00,R3',
+            'Chemistry,,bim,Monday,11:00,10:00,R3',
+            'Biology,,,Monday,08:30,09:30,R9',  # clashes with a saved row
+            'Statistics,ann,bim,Sunday,10:00,11:00,R1',  # touches the first row only
+        ])
+        self.assertIn('Imported 2 row(s); 5 error(s).', out)
+        for line, message in [(3, 'The teacher already teaches'), (4, 'Room r1'), (5, "unknown teacher 'zed'"),
+                              (6, 'end_time must be after start_time'), (7, 'Room R9')]:
+            self.assertIn(f'line {line}: {message}', err)
+        self.assertEqual(
+            set(Schedule.objects.values_list('course', flat=True)), {'Existing', 'Databases', 'Statistics'},
+        )
+
+    def test_rows_failing_in_the_database_do_not_block_later_rows(self):
+        materialize = timetable.materialize
+
+        def fail_on_broken(schedules):
+            if any(s.course == 'Broken' for s in schedules):
+                raise DatabaseError('simulated failure')
+            materialize(schedules)
+
+        with mock.patch.object(timetable, 'materialize', side_effect=fail_on_broken):
+            out, err = self.run_import([
+                'Databases,,bim,Sunday,09:00,10:00,R1',
+                'Broken,,bim,Sunday,11:00,12:00,R1',
+                'Networks,,bim,Sunday,11:00,12:00,R1',
+            ], batch_size=2)
+        self.assertIn('Imported 2 row(s); 1 error(s).', out)
+        self.assertIn('line 3: simulated failure', err)
+        self.assertEqual(
+            sorted(Schedule.objects.values_list('course', flat=True)), ['Databases', 'Existing', 'Networks'],
+        )
+
+
+class OccupancyTests(TestCase):
+    def setUp(self):
+        self.ann = Teacher.objects.create_user('ann', department='BIM')
+        self.bob = Teacher.objects.create_user('bob', department='BIM')
+        Schedule.objects.create(
+            course='Databases', teacher=self.ann, day='Sunday', start_time=time(9), end_time=time(10), room='Lab 1',
+        )
+
+    def schedule(self, **fields):
+        values = {'course': 'Networks', 'teacher': self.bob, 'day': 'Sunday',
+                  'start_time': time(9, 30), 'end_time': time(10, 30), 'room': 'R2', **fields}
+        return Schedule(**values)
+
+    def test_interval_index(self):
+        index = IntervalIndex()
+        for start, end, item in [(540, 600, 'a'), (600, 660, 'b'), (480, 720, 'c'), (540, 560, 'd')]:
+            index.add(start, end, item)
+        self.assertEqual(index.overlapping(590, 610), ['c', 'a', 'b'])
+        self.assertEqual(index.overlapping(720, 780), [])
+        index.remove(480, 720, 'c')
+        self.assertEqual(index.overlapping(400, 545), ['a', 'd'])
+
+    def test_overlaps_clash_and_touching_edges_do_not(self):
+        with self.assertRaisesMessage(ValidationError, 'already booked on Sunday 09:00-10:00'):
+            self.schedule(room='lab 1 ').full_clean()
+        with self.assertRaisesMessage(ValidationError, 'The teacher already teaches Databases'):
+            self.schedule(teacher=self.ann).full_clean()
+        self.schedule(room='LAB 1', start_time=time(10), end_time=time(11)).full_clean()
+        self.schedule(room='Lab 1', day='Monday').full_clean()
+
+    def test_one_off_classes_clash_on_their_own_date(self):
+        sunday = date(2026, 10, 18)
+        self.schedule(room='Lab 2', date=sunday).save()
+        # Another week's one-off class is free, the weekly class meets every week
+        self.schedule(room='Lab 2', teacher=None, date=sunday + timedelta(days=7)).full_clean()
+        with self.assertRaises(ValidationError):
+            self.schedule(room='Lab 2', teacher=None, date=sunday).full_clean()
+        with self.assertRaises(ValidationError):
+            self.schedule(room='Lab 1', teacher=None, day='Monday', date=sunday).full_clean()
+        # A weekly class clashes with a one-off class on any date falling on its weekday
+        with self.assertRaises(ValidationError):
+            self.schedule(room='Lab 2', teacher=None, day='sun').full_clean()
+
+    def test_forms_report_blank_fields_instead_of_crashing(self):
+        form = modelform_factory(Schedule, fields='__all__')({
+            'course': 'Networks', 'day': 'Sunday', 'start_time': '', 'end_time': '10:00', 'room': 'Lab 1',
+        })
+        self.assertIn('start_time', form.errors)
+        for data in ({'date': '2026-10-18', 'time': '', 'venue': 'Hall'}, {'date': '', 'time': '14:00', 'venue': 'Hall'}):
+            form = MeetingForm(data, instance=Meeting(created_by=self.ann))
+            self.assertFalse(form.is_valid())
+
+    def test_impossible_meeting_date_is_a_validation_error(self):
+        with self.assertRaises(ValidationError):
+            Meeting(created_by=self.ann, date='2026-02-30', time='14:00', venue='Hall').full_clean()
+        self.client.force_login(self.ann)
+        response = self.client.post(reverse('create_meeting'), {'date': '2026-02-30', 'time': '14:00', 'venue': 'Hall'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Meeting.objects.exists())
+
+    def test_save_does_not_validate(self):
+        with mock.patch.object(occupancy, 'schedule_conflicts') as check:
+            self.schedule(teacher=self.ann).save()
+            Meeting.objects.create(created_by=self.ann, date=date(2026, 10, 18), time=time(9), venue='Lab 1')
+        check.assert_not_called()
+        self.assertEqual(Schedule.objects.filter(teacher=self.ann).count(), 2)
+
+    def test_check_reads_only_overlapping_rows(self):
+        for day in ('Monday', 'Tuesday', 'Friday'):
+            Schedule.objects.create(course='Other', teacher=self.ann, day=day,
+                                    start_time=time(9), end_time=time(10), room='Lab 1')
+        Schedule.objects.create(course='Later', teacher=self.ann, day='Sunday',
+                                start_time=time(11), end_time=time(12), room='Lab 1')
+        Schedule.objects.create(course='Next week', teacher=self.ann, day='Sunday', date=date(2026, 10, 25),
+                                start_time=time(9), end_time=time(10), room='Lab 1')
+        with mock.patch.object(occupancy.OccupancyIndex, 'add', autospec=True,
+                               side_effect=occupancy.OccupancyIndex.add) as add:
+            with self.assertRaises(ValidationError):
+                self.schedule(teacher=self.ann, room='Lab 1', date=date(2026, 10, 18)).full_clean()
+        self.assertEqual([call.args[1].course for call in add.call_args_list], ['Databases'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.staff = Teacher.objects.create_user('ann', password='secret', department='BIM', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_routes_are_exported_in_prometheus_format(self):
+        self.client.get(reverse('schedule'))
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE lms_view_wall_seconds histogram', body)
+        self.assertIn('lms_view_render_seconds_bucket{route="schedule",le="+Inf"}', body)
+        count = re.search(r'^lms_view_sql_queries_count\{route="schedule"\} (\d+)$', body, re.M)
+        self.assertGreaterEqual(int(count.group(1)), 1)
+
+    def test_repeated_statements_are_counted(self):
+        def n_plus_one(request):
+            for pk in range(6):
+                Teacher.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        request = RequestFactory().get('/loop')
+        request.resolver_match = None
+        with self.assertLogs('home.metrics', 'WARNING'):
+            QueryMetricsMiddleware(n_plus_one)(request)
+        self.assertIn('lms_view_repeated_sql_total{route="unmatched"}', REGISTRY.render())
+
+    def test_staff_only(self):
+        self.client.force_login(Teacher.objects.create_user('bob', password='secret'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+
+
+def sqlite_alias(test, alias, table):
+    """
+    Add database ``alias`` for the rest of ``test``: a new SQLite file with
+    an empty copy of ``table``. Returns the file's path.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    path = Path(directory.name) / f'{alias}.db'
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name = %s AND sql IS NOT NULL", [table])
+        schema = [sql for sql, in cursor.fetchall()]
+    with sqlite3.connect(path) as db:
+        for sql in schema:
+            db.execute(sql)
+    for patcher in (
+        mock.patch.dict(settings.DATABASES, {alias: {**settings.DATABASES['default'], 'NAME': str(path)}}),
+        # The alias only exists from here on, so it can't be listed in databases up front
+        mock.patch.object(type(test), 'databases', test.databases | {alias}),
+    ):
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    test.addCleanup(connections.__delitem__, alias)
+    test.addCleanup(lambda: connections[alias].close())
+    return path
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        Dept.objects.create(name='BIM')
+        # The replica is a second SQLite file with a different department
+        self.replica_path = sqlite_alias(self, REPLICA, 'home_dept')
+        with sqlite3.connect(self.replica_path) as replica:
+            replica.execute("INSERT INTO home_dept (name) VALUES ('CSIT')")
+
+    def replica_depts(self):
+        with sqlite3.connect(self.replica_path) as replica:
+            return [name for name, in replica.execute("SELECT name FROM home_dept")]
+
+    def dept_names(self, request):
+        return HttpResponse(','.join(Dept.objects.order_by('name').values_list('name', flat=True)))
+
+    def test_get_reads_from_replica(self):
+        response = ReplicaRoutingMiddleware(self.dept_names)(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'CSIT')
+
+    def test_pinned_get_reads_from_primary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[PRIMARY_PIN_COOKIE] = '1'
+        self.assertEqual(ReplicaRoutingMiddleware(self.dept_names)(request).content, b'BIM')
+
+    def test_write_request_writes_and_reads_primary(self):
+        seen = []
+
+        def read_back(sender, instance, **kwargs):
+            seen.append(Dept.objects.filter(pk=instance.pk).exists())
+
+        post_save.connect(read_back, sender=Dept)
+        self.addCleanup(post_save.disconnect, read_back, sender=Dept)
+
+        def create(request):
+            Dept.objects.create(name='BCA')
+            return self.dept_names(request)
+
+        response = ReplicaRoutingMiddleware(create)(RequestFactory().post('/'))
+        self.assertEqual(response.content, b'BCA,BIM')
+        self.assertEqual(seen, [True])
+        self.assertEqual(response.cookies[PRIMARY_PIN_COOKIE].value, '1')
+        self.assertEqual(self.replica_depts(), ['CSIT'])
+
+
+class TimetableApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        bim = Dept.objects.create(name='BIM')
+        self.teacher = Teacher.objects.create_user('ann', password='secret', first_name='Ann', department='BIM')
+        for hour in (8, 9):
+            Schedule.objects.create(
+                course=f'Course {hour}', teacher=self.teacher, dept=bim, day='Sunday',
+                start_time=time(hour), end_time=time(hour + 1), room='R1',
+            )
+        self.client.force_login(self.teacher)
+
+    def get(self, **headers):
+        return self.client.get(reverse('timetable_api'), headers=headers)
+
+    def test_streams_json_with_validators(self):
+        response = self.get()
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))['results']), 2)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_unchanged_timetable_is_not_modified(self):
+        first = self.get()
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.get(if_none_match=first['ETag']).status_code, 304)
+        self.assertFalse([q for q in captured.captured_queries if 'home_schedule' in q['sql']])
+        self.assertEqual(self.get(if_modified_since=first['Last-Modified']).status_code, 304)
+        # Logging in only updates last_login
+        self.client.login(username='ann', password='secret')
+        self.assertEqual(self.get(if_none_match=first['ETag']).status_code, 304)
+
+    def test_changes_give_a_new_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Schedule.objects.filter(course='Course 9').delete()
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changes_in_another_worker_give_a_new_etag(self):
+        etag = self.get()['ETag']
+        # Another process has its own connection to the same cache
+        with mock.patch.object(caching, 'cache', caches.create_connection('default')):
+            with self.captureOnCommitCallbacks(execute=True):
+                Schedule.objects.filter(course='Course 9').delete()
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        bim = Dept.objects.create(name='BIM')
+        self.teacher = Teacher.objects.create_user('ann', first_name='Ann', department='BIM')
+        Schedule.objects.create(
+            course='Databases', teacher=self.teacher, dept=bim, day='Sunday',
+            start_time=time(8), end_time=time(9), room='R1',
+        )
+        today = now().date()
+        self.last_sunday = today - timedelta(days=(today.weekday() + 1) % 7 or 7)
+        LeaveRequest.objects.create(teacher=self.teacher, date=self.last_sunday, status='approved')
+        LeaveRequest.objects.create(teacher=self.teacher, date=self.last_sunday - timedelta(days=7), status='rejected')
+
+    def feed(self):
+        response = self.client.get(ical.feed_url('teacher', self.teacher.pk))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_every_tzid_has_a_vtimezone(self):
+        body = self.feed()
+        tzids = set(re.findall(r';TZID=([^:;]+)', body))
+        self.assertEqual(tzids, {settings.TIME_ZONE})
+        self.assertIn(f'BEGIN:VTIMEZONE\r\nTZID:{settings.TIME_ZONE}\r\n', body)
+        self.assertLess(body.index('END:VTIMEZONE'), body.index('BEGIN:VEVENT'))
+
+    def test_daylight_saving_changes_are_listed(self):
+        lines = ical._vtimezone('America/New_York', 2026)
+        start = lines.index('BEGIN:DAYLIGHT')
+        self.assertEqual(lines[start + 1:start + 4], [
+            'DTSTART:20260308T020000', 'TZOFFSETFROM:-0500', 'TZOFFSETTO:-0400',
+        ])
+        self.assertEqual(lines.count('BEGIN:DAYLIGHT'), ical.VTIMEZONE_YEARS)
+
+    def test_purge_keeps_leave_the_feed_still_cancels(self):
+        purge_expired()
+        self.assertEqual(list(LeaveRequest.objects.values_list('status', flat=True)), ['approved'])
+        self.assertIn(f"EXDATE;TZID={settings.TIME_ZONE}:{self.last_sunday:%Y%m%d}T080000", self.feed())
+        purge_expired(today=self.last_sunday + timedelta(days=ical.HISTORY_DAYS + 1))
+        self.assertFalse(LeaveRequest.objects.exists())
+
+    def test_one_off_class_on_leave_is_cancelled(self):
+        for day in (self.last_sunday, self.last_sunday - timedelta(days=7)):
+            Schedule.objects.create(
+                course=f'Lab {day:%d}', teacher=self.teacher, day='Sunday', date=day,
+                start_time=time(10), end_time=time(11), room='R2',
+            )
+        events = {re.search(r'SUMMARY:(.*?)\r\n', event).group(1): event for event in self.feed().split('BEGIN:VEVENT')[1:]}
+        self.assertIn('STATUS:CANCELLED', events[f'Lab {self.last_sunday:%d}'])
+        self.assertNotIn('STATUS:CANCELLED', events[f'Lab {self.last_sunday - timedelta(days=7):%d}'])
+
+    def test_feed_is_not_cached_under_an_etag_changed_while_streaming(self):
+        response = self.client.get(ical.feed_url('teacher', self.teacher.pk))
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        with self.captureOnCommitCallbacks(execute=True):
+            Schedule.objects.update(room='R9')
+            caching.bump_version('timetable')
+        body = b''.join(chunks).decode()
+        self.assertIn('LOCATION:R9', body)
+        self.assertIsNone(ical.cached_feed('teacher', str(self.teacher.pk), response['ETag'].strip('"')))
+        self.assertEqual(self.feed().count('LOCATION:R9'), 1)
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        source, self.root = Path(tmp.name) / 'src', Path(tmp.name) / 'static'
+        source.mkdir()
+        (source / 'site.css').write_text('body { color: red; }\n' * 50)
+        overrides = override_settings(
+            STATICFILES_DIRS=[source], STATIC_ROOT=self.root,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = staticfiles_storage.stored_name('site.css')
+
+    def get(self, name, **headers):
+        return self.client.get(settings.STATIC_URL + name, headers=headers)
+
+    def test_collectstatic_writes_compressed_copies(self):
+        self.assertNotEqual(self.hashed, 'site.css')
+        self.assertEqual(gzip.decompress((self.root / f'{self.hashed}.gz').read_bytes()), (self.root / self.hashed).read_bytes())
+
+    def test_encoding_follows_accept_encoding(self):
+        (self.root / f'{self.hashed}.br').write_bytes(b'brotli bytes')
+        for accept, encoding in (('gzip, deflate, br', 'br'), ('gzip', 'gzip'), ('', None)):
+            response = self.get(self.hashed, accept_encoding=accept)
+            self.assertEqual(response.get('Content-Encoding'), encoding, accept)
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertIn('immutable', response['Cache-Control'])
+
+    def test_direct_archive_requests_are_not_encoded(self):
+        response = self.get(f'{self.hashed}.gz', accept_encoding='gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_unhashed_names_revalidate(self):
+        response = self.get('site.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.get('site.css', if_modified_since=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.get('../src/site.css').status_code, 404)
+
+    def test_picture_lists_variants_before_the_original(self):
+        variants = {'hero.jpg': [
+            {'name': 'hero.1.480w.avif', 'format': 'avif', 'width': 480, 'height': 240},
+            {'name': 'hero.1.480w.webp', 'format': 'webp', 'width': 480, 'height': 240},
+        ]}
+        with mock.patch.object(static_variants, '_variants', variants):
+            html = static_variants.static_picture('hero.jpg', alt='Hero')
+            self.assertLess(html.index('image/avif'), html.index('image/webp'))
+            self.assertIn('srcset="/static/hero.1.480w.webp 480w"', html)
+            self.assertNotIn('<source', static_variants.static_picture('other.jpg'))
+
+
+def _upload(color):
+    out = BytesIO()
+    thumbnails.Image.new('RGB', (400, 300), color).save(out, 'JPEG')
+    return SimpleUploadedFile('me.jpg', out.getvalue(), content_type='image/jpeg')
+
+
+@skipIf(thumbnails.Image is None, "Pillow is not installed")
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        overrides = override_settings(MEDIA_ROOT=self.media, THUMBNAILS_IN_BACKGROUND=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.teacher = Teacher.objects.create_user('ann', password='secret', department='BIM')
+
+    def upload(self, color):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.profile_picture = _upload(color)
+            self.teacher.save()
+        return self.teacher.profile_picture.name
+
+    def thumbnail(self, name, size):
+        return self.media / thumbnails.thumbnail_name(name, size)
+
+    def test_upload_writes_square_thumbnails(self):
+        name = self.upload('red')
+        for size in thumbnails.THUMBNAIL_SIZES:
+            with thumbnails.Image.open(self.thumbnail(name, size)) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', (size, size)))
+
+    def test_replacing_the_picture_drops_old_thumbnails(self):
+        first = self.upload('red')
+        second = self.upload('blue')
+        self.assertFalse(self.thumbnail(first, 60).exists())
+        self.assertTrue(self.thumbnail(second, 60).exists())
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.teacher.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+    def test_avatar_uses_thumbnails_with_fallback(self):
+        name = self.upload('red')
+        self.client.force_login(self.teacher)
+        html = self.client.get(reverse('profile')).content.decode()
+        self.assertIn(f'srcset="{thumbnails.thumbnail_url(name, 120)} 1x, {thumbnails.thumbnail_url(name, 240)} 2x"', html)
+        self.assertIn(f'data-original="{self.teacher.profile_picture.url}"', html)
+
+    def test_command_backfills_missing_thumbnails(self):
+        name = self.upload('red')
+        thumbnails.delete_thumbnails(name)
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertTrue(self.thumbnail(name, 240).exists())
+
+
+class TimetableSlotTests(TestCase):
+    def setUp(self):
+        self.bim = Dept.objects.create(name='BIM')
+        self.ann = Teacher.objects.create_user('ann', department='BIM')
+        self.schedule = Schedule.objects.create(
+            course='Databases', teacher=self.ann, dept=self.bim, day='Sunday',
+            start_time=time(9), end_time=time(10, 30), room='Lab 1',
+        )
+
+    def cells(self):
+        return list(TimetableSlot.objects.order_by('weekday', 'slot').values_list(
+            'schedule_id', 'teacher_id', 'weekday', 'slot', 'room',
+        ))
+
+    def test_save_writes_one_cell_per_slot(self):
+        # 09:00-10:30 on Sunday (weekday 6) covers three 30-minute slots
+        self.assertEqual(self.cells(), [(self.schedule.pk, self.ann.pk, 6, slot, 'Lab 1') for slot in (18, 19, 20)])
+
+    def test_save_replaces_cells(self):
+        bob = Teacher.objects.create_user('bob', department='BIM')
+        self.schedule.teacher = bob
+        self.schedule.day = 'monday'
+        self.schedule.end_time = time(9, 30)
+        self.schedule.room = 'Lab 2'
+        self.schedule.save()
+        self.assertEqual(self.cells(), [(self.schedule.pk, bob.pk, 0, 18, 'Lab 2')])
+
+    def test_one_off_classes_go_on_their_dates_weekday(self):
+        # Tuesday, whatever the day field says
+        self.schedule.date = date(2026, 10, 20)
+        self.schedule.save()
+        self.assertEqual(self.cells(), [(self.schedule.pk, self.ann.pk, 1, slot, 'Lab 1') for slot in (18, 19, 20)])
+        self.assertEqual(set(TimetableSlot.objects.values_list('date', flat=True)), {date(2026, 10, 20)})
+        expected = self.cells()
+        TimetableSlot.objects.all().delete()
+        timetable.rebuild()
+        self.assertEqual(self.cells(), expected)
+
+        # They only show in their own week
+        self.client.force_login(self.ann)
+        self.assertContains(self.client.get(reverse('my_week'), {'week': '2026-10-25'}), 'Databases</strong> (Oct 20)')
+        self.assertNotContains(self.client.get(reverse('my_week'), {'week': '2026-10-26'}), 'Databases')
+        self.assertNotContains(self.client.get(reverse('my_week'), {'week': 'soon'}), 'Databases')
+        self.assertEqual(substitutes._classes_on('BIM', date(2026, 10, 27)), [])
+        self.assertEqual(len(substitutes._classes_on('BIM', date(2026, 10, 20))), 1)
+
+    def test_delete_removes_cells(self):
+        self.schedule.delete()
+        self.assertEqual(self.cells(), [])
+
+    def test_rebuild_matches_signals(self):
+        Schedule.objects.create(
+            course='Networks', teacher=self.ann, dept=self.bim, day='Tuesday',
+            start_time=time(13), end_time=time(14), room='R2',
+        )
+        expected = self.cells()
+        TimetableSlot.objects.all().delete()
+        self.assertEqual(timetable.rebuild(), len(expected))
+        self.assertEqual(self.cells(), expected)
+
+
+class FreeRoomApiTests(TestCase):
+    SUNDAY = date(2026, 10, 18)
+
+    def setUp(self):
+        cache.clear()
+        self.ann = Teacher.objects.create_user('ann', department='BIM')
+        Schedule.objects.create(
+            course='Databases', teacher=self.ann, day='Sunday', start_time=time(9), end_time=time(10), room='Lab 1',
+        )
+        Schedule.objects.create(
+            course='Networks', teacher=self.ann, day='Monday', start_time=time(9), end_time=time(10), room='R2',
+        )
+        Meeting.objects.create(created_by=self.ann, date=self.SUNDAY, time=time(9), venue='Hall')
+        self.client.force_login(self.ann)
+
+    def rooms(self, **params):
+        response = self.client.get(reverse('free_rooms_api'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['rooms']
+
+    def test_weekday_checks_weekly_classes_only(self):
+        self.assertEqual(self.rooms(day='sunday', start='09:30', end='10:00'), ['Hall', 'R2'])
+        # Touching the end of a class is free
+        self.assertEqual(self.rooms(day='Sunday', start='10:00', end='11:00'), ['Hall', 'Lab 1', 'R2'])
+
+    def test_date_adds_meetings_and_one_off_classes(self):
+        Schedule.objects.create(
+            course='Networks', teacher=self.ann, day='Sunday', date=self.SUNDAY,
+            start_time=time(11), end_time=time(12), room='R2',
+        )
+        self.assertEqual(self.rooms(date='2026-10-18', start='09:30', end='10:00'), ['R2'])
+        self.assertEqual(self.rooms(date='2026-10-18', start='11:30', end='12:00'), ['Hall', 'Lab 1'])
+        # Neither the meeting nor the one-off class blocks the next Sunday
+        self.assertEqual(self.rooms(date='2026-10-25', start='11:30', end='12:00'), ['Hall', 'Lab 1', 'R2'])
+
+    def test_response_echoes_the_window(self):
+        response = self.client.get(reverse('free_rooms_api'), {'date': '2026-10-18', 'start': '09:00', 'end': '09:15'})
+        self.assertEqual(
+            {key: value for key, value in response.json().items() if key != 'rooms'},
+            {'start': '09:00', 'end': '09:15', 'date': '2026-10-18', 'day': 'Sunday'},
+        )
+
+    def test_invalid_window_is_a_400(self):
+        for params, error in (
+            ({'day': 'Sunday', 'start': '10:00', 'end': '09:00'}, 'end must be after start'),
+            ({'start': '09:00', 'end': '10:00'}, 'pass a date (YYYY-MM-DD) or a day (e.g. Sunday)'),
+            ({'day': 'Funday', 'start': '09:00', 'end': '10:00'}, 'pass a date (YYYY-MM-DD) or a day (e.g. Sunday)'),
+            ({'day': 'Sunday', 'start': 'nine', 'end': '10:00'}, None),
+            ({'date': '18/10/2026', 'start': '09:00', 'end': '10:00'}, None),
+        ):
+            response = self.client.get(reverse('free_rooms_api'), params)
+            self.assertEqual(response.status_code, 400, params)
+            if error:
+                self.assertEqual(response.json(), {'error': error})
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('free_rooms_api'), {'day': 'Sunday'}).status_code, 302)
+
+
+class SubstituteTests(TestCase):
+    SUNDAY = date(2026, 10, 18)
+
+    def setUp(self):
+        cache.clear()
+        Dept.objects.create(name='BIM')
+        teachers = {name: Teacher.objects.create_user(name, department='BIM') for name in ('ann', 'bob', 'cat', 'dan', 'eve')}
+        self.ann = teachers['ann']
+        # Never suggested: a superuser and another department's teacher
+        Teacher.objects.create_superuser('root', department='BIM')
+        Teacher.objects.create_user('zed', department='BCA')
+        for teacher, course, day, start, end, room in (
+            ('ann', 'Databases', 'Sunday', time(9), time(10), 'Lab 1'),
+            ('ann', 'Networks', 'Sunday', time(10), time(11), 'Lab 2'),
+            ('bob', 'databases ', 'Monday', time(9), time(10), 'Lab 1'),
+            ('dan', 'Networks', 'Sunday', time(11), time(12), 'Lab 2'),
+            ('eve', 'Networks', 'Sunday', time(9, 30), time(10, 30), 'R5'),
+        ):
+            Schedule.objects.create(
+                course=course, teacher=teachers[teacher], day=day, start_time=start, end_time=end, room=room,
+            )
+        self.leave = LeaveRequest.objects.create(teacher=self.ann, date=self.SUNDAY, status='approved')
+        LeaveRequest.objects.create(teacher=teachers['cat'], date=self.SUNDAY, status='pending')
+        self.client.force_login(teachers['bob'])
+
+    def candidates(self):
+        return [
+            (slot['course'], [candidate['name'] for candidate in slot['candidates']])
+            for slot in substitutes.build_suggestions('BIM', self.SUNDAY)
+        ]
+
+    def test_course_then_load_then_name(self):
+        # bob teaches Databases; eve is busy at 09:30. Covering 09:00 gives
+        # bob a class, so he drops behind cat for 10:00, where dan knows the course.
+        self.assertEqual(self.candidates(), [
+            ('Databases', ['bob', 'cat', 'dan']),
+            ('Networks', ['dan', 'cat', 'bob']),
+        ])
+        first = substitutes.build_suggestions('BIM', self.SUNDAY)[0]['candidates'][0]
+        self.assertEqual((first['teaches_course'], first['classes_today']), (True, 0))
+
+    def test_department_meeting_blocks_everyone(self):
+        Meeting.objects.create(created_by=self.ann, date=self.SUNDAY, time=time(9), venue='Hall')
+        self.assertEqual(self.candidates(), [
+            ('Databases', []),
+            ('Networks', ['dan', 'bob', 'cat']),
+        ])
+
+    def test_no_approved_leave_no_suggestions(self):
+        self.assertEqual(substitutes.build_suggestions('BIM', self.SUNDAY + timedelta(days=7)), [])
+
+    def test_api_is_refreshed_when_leave_changes(self):
+        url = reverse('substitutes_api', args=['bim'])
+        response = self.client.get(url, {'date': '2026-10-18'})
+        self.assertEqual(response.json()['dept'], 'BIM')
+        self.assertEqual(len(response.json()['slots']), 2)
+        self.leave.status = 'rejected'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leave.save()
+        self.assertEqual(self.client.get(url, {'date': '2026-10-18'}).json()['slots'], [])
+
+    def test_api_errors(self):
+        self.assertEqual(self.client.get(reverse('substitutes_api', args=['bim']), {'date': 'sunday'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('substitutes_api', args=['law'])).status_code, 404)
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bim = Dept.objects.create(name='BIM')
+        self.teacher = Teacher.objects.create_user('ann', department='BIM')
+        patcher = mock.patch.object(events, 'broker', events.Broker())
+        self.broker = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def publish(self, count):
+        return [self.broker.publish('BIM', 'leave', {'n': n}) for n in range(count)]
+
+    def backlog(self, last_event_id):
+        # subscribe() needs a running loop, so this is only called from async tests
+        _, messages = self.broker.subscribe('BIM', last_event_id)
+        return [message.split('\n')[0] for message in messages]
+
+    def test_ids_differ_across_restarts(self):
+        before, after = events.Broker(), events.Broker()
+        self.assertNotEqual(before.publish('BIM', 'leave', {}), after.publish('BIM', 'leave', {}))
+
+    async def test_backlog_follows_last_event_id(self):
+        ids = self.publish(3)
+        self.assertEqual(self.backlog(None), [])
+        self.assertEqual(self.backlog(ids[0]), [f'id: {ids[1]}', f'id: {ids[2]}'])
+        self.assertEqual(self.backlog(ids[2]), [])
+        # An id from before a restart, or a malformed one, replays everything kept
+        self.assertEqual(self.backlog('0a0a0a0a-2'), [f'id: {event_id}' for event_id in ids])
+        self.assertEqual(self.backlog('2'), [f'id: {event_id}' for event_id in ids])
+
+    async def test_stream_delivers_events_and_drops_slow_clients(self):
+        await self.async_client.aforce_login(self.teacher)
+        ids = self.publish(2)
+        response = await self.async_client.get(
+            reverse('department_events', args=[self.bim.pk]), headers={'Last-Event-ID': ids[0]},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertEqual(await anext(content), b'retry: 5000\n\n')
+        self.assertEqual(await anext(content), f'id: {ids[1]}\nevent: leave\ndata: {{"n": 1}}\n\n'.encode())
+
+        event_id = self.broker.publish('BIM', 'meeting', {'venue': 'Hall'})
+        self.assertEqual(await anext(content), f'id: {event_id}\nevent: meeting\ndata: {{"venue": "Hall"}}\n\n'.encode())
+        self.assertEqual(self.broker.subscriber_count('BIM'), 1)
+
+        # A client more than SUBSCRIBER_QUEUE_SIZE events behind is disconnected
+        self.publish(events.SUBSCRIBER_QUEUE_SIZE + 1)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(content)
+        self.assertEqual(self.broker.subscriber_count('BIM'), 0)
+
+    async def test_unknown_department_is_a_404(self):
+        await self.async_client.aforce_login(self.teacher)
+        response = await self.async_client.get(reverse('department_events', args=[self.bim.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi_gets_no_stream(self):
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(reverse('department_events', args=[self.bim.pk])).status_code, 204)
+
+    def test_pages_subscribe_only_to_known_departments(self):
+        url = reverse('department_events', args=[self.bim.pk])
+        for department, subscribed in (('bim', True), ('', False), ('BIM/IT', False), ('LAW', False)):
+            teacher = Teacher.objects.create_user(f'user{len(department)}{subscribed}', department=department)
+            self.client.force_login(teacher)
+            for page in ('index', 'schedule'):
+                response = self.client.get(reverse(page))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(url in response.content.decode(), subscribed)
+
+
+class TeacherIdTests(TestCase):
+    def test_blocks_follow_on_from_single_ids(self):
+        start = int(Teacher.objects.create_user('ann').teacher_id)
+        self.assertEqual(TeacherIdSequence.reserve(3), [format_teacher_id(start + n) for n in (1, 2, 3)])
+        self.assertEqual(Teacher.objects.create_user('bob').teacher_id, format_teacher_id(start + 4))
+
+    def test_bulk_assignment_reserves_one_block(self):
+        teachers = [Teacher(username=f't{n}') for n in range(4)] + [Teacher(username='kept', teacher_id='X1')]
+        with mock.patch.object(TeacherIdSequence, 'reserve', wraps=TeacherIdSequence.reserve) as reserve:
+            Teacher.objects.bulk_create(assign_teacher_ids(teachers))
+        reserve.assert_called_once_with(4)
+        ids = list(Teacher.objects.order_by('username').values_list('teacher_id', flat=True))
+        self.assertEqual(ids[0], 'X1')
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_concurrent_reservations_do_not_overlap(self):
+        # A file database, so writers wait for each other's lock like in production
+        sqlite_alias(self, 'ids', 'home_teacheridsequence')
+        reserved, errors = [], []
+
+        def reserve():
+            try:
+                for _ in range(10):
+                    reserved.extend(TeacherIdSequence.reserve(3))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections['ids'].close()
+
+        with mock.patch.object(ReplicaRouter, 'db_for_write', return_value='ids'):
+            threads = [threading.Thread(target=reserve) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(reserved), [format_teacher_id(n) for n in range(1, 121)])
+
+    def test_ids_must_fit_the_column(self):
+        self.assertEqual(check_teacher_id_length(None), [])
+        with self.assertRaises(ValueError):
+            format_teacher_id(10 ** TEACHER_ID_MAX_LENGTH)
+        with override_settings(TEACHER_ID_PREFIX='TCH-', TEACHER_ID_DIGITS=9):
+            self.assertEqual([error.id for error in check_teacher_id_length(None)], ['home.E001'])
+            with self.assertRaises(ValueError):
+                format_teacher_id(1)
+
+    def test_migration_repads_old_ids_and_seeds_sequence(self):
+        migration = import_module('home.migrations.0014_teacheridsequence')
+        for username, old_id in (('ann', '042'), ('bob', '7'), ('cat', 'X12')):
+            Teacher.objects.filter(pk=Teacher.objects.create_user(username).pk).update(teacher_id=old_id)
+        TeacherIdSequence.objects.all().delete()
+        with connection.cursor() as cursor:
+            migration.widen_teacher_ids(apps, mock.Mock(connection=connection, execute=cursor.execute))
+        self.assertEqual(
+            dict(Teacher.objects.values_list('username', 'teacher_id')),
+            {'ann': '000042', 'bob': '000007', 'cat': 'X12'},
+        )
+        self.assertEqual(Teacher.objects.create_user('dan').teacher_id, '000043')
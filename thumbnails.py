@@ -0,0 +1,76 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+
+logger = logging.getLogger(__name__)
+
+# Square avatar edges in pixels: 60 for teacher_list, 120 for the profile
+# page, and 2x versions of both for high-density screens
+THUMBNAIL_SIZES = (60, 120, 240)
+THUMBNAIL_QUALITY = 80
+
+# One worker: resizing is CPU bound and uploads are rare
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+
+def thumbnail_name(name, size):
+    """Thumbnails sit next to the original: profile_pics/ann.jpg -> profile_pics/ann.120.webp."""
+    return f'{posixpath.splitext(name)[0]}.{size}.webp'
+
+
+def thumbnail_url(name, size):
+    return default_storage.url(thumbnail_name(name, size))
+
+
+def generate_thumbnails(name, storage=default_storage):
+    if Image is None:
+        return
+    try:
+        with storage.open(name) as handle:
+            image = Image.open(BytesIO(handle.read()))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, ValueError):
+        logger.warning("Cannot make thumbnails for %s", name, exc_info=True)
+        return
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info else 'RGB')
+
+    for size in THUMBNAIL_SIZES:
+        out = BytesIO()
+        ImageOps.fit(image, (size, size), Image.LANCZOS).save(out, 'WEBP', quality=THUMBNAIL_QUALITY)
+        target = thumbnail_name(name, size)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(out.getvalue()))
+
+
+def delete_thumbnails(name, storage=default_storage):
+    for size in THUMBNAIL_SIZES:
+        target = thumbnail_name(name, size)
+        if storage.exists(target):
+            storage.delete(target)
+
+
+def _run(func, name):
+    try:
+        func(name)
+    except Exception:
+        logger.exception("Thumbnail job %s failed for %s", func.__name__, name)
+
+
+def schedule(func, name):
+    """Run ``func(name)`` on the thumbnail thread, or inline when THUMBNAILS_IN_BACKGROUND is off."""
+    if getattr(settings, 'THUMBNAILS_IN_BACKGROUND', True):
+        return _executor.submit(_run, func, name)
+    _run(func, name)
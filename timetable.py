@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Schedule, TimetableSlot
+from .occupancy import WEEKDAYS, _label, _minutes, _weekday
+
+
+# Changing the slot length needs `python manage.py rebuild_timetable`
+SLOT_MINUTES = getattr(settings, 'TIMETABLE_SLOT_MINUTES', 30)
+CELL_FIELDS = ('schedule_id', 'teacher_id', 'dept_id', 'course', 'room', 'date', 'start_time', 'end_time')
+
+
+def slot_range(start_time, end_time):
+    """Slots a class from ``start_time`` to ``end_time`` touches."""
+    start, end = _minutes(start_time), _minutes(end_time)
+    if end <= start:
+        return range(0)
+    return range(start // SLOT_MINUTES, (end - 1) // SLOT_MINUTES + 1)
+
+
+def grid_cells(schedule):
+    """Unsaved TimetableSlot rows for a class; a one-off class goes on its date's weekday."""
+    weekday = _weekday(schedule)
+    if weekday is None:
+        return []
+    values = {field: getattr(schedule, field) for field in CELL_FIELDS if field != 'schedule_id'}
+    return [
+        TimetableSlot(schedule_id=schedule.pk, weekday=weekday, slot=slot, **values)
+        for slot in slot_range(schedule.start_time, schedule.end_time)
+    ]
+
+
+def materialize(schedules):
+    """Replace the grid cells of ``schedules`` after they were saved."""
+    with transaction.atomic():
+        TimetableSlot.objects.filter(schedule_id__in=[s.pk for s in schedules]).delete()
+        TimetableSlot.objects.bulk_create([cell for s in schedules for cell in grid_cells(s)])
+
+
+def rebuild(batch_size=1000):
+    """Rematerialize the whole grid; returns the number of cells written."""
+    written = 0
+    with transaction.atomic():
+        TimetableSlot.objects.all().delete()
+        cells = []
+        rows = Schedule.objects.only('day', *CELL_FIELDS[1:]).order_by('pk')
+        for schedule in rows.iterator(chunk_size=batch_size):
+            cells.extend(grid_cells(schedule))
+            if len(cells) >= batch_size:
+                written += len(TimetableSlot.objects.bulk_create(cells))
+                cells = []
+        written += len(TimetableSlot.objects.bulk_create(cells))
+    return written
+
+
+def _in_week(cells, week_start):
+    # Weekly classes, plus one-off classes dated Monday ``week_start`` to Sunday
+    return cells.filter(Q(date=None) | Q(date__range=(week_start, week_start + timedelta(days=6))))
+
+
+def teacher_week(teacher_id, week_start):
+    return _in_week(TimetableSlot.objects.filter(teacher_id=teacher_id), week_start).order_by('weekday', 'slot', 'start_time')
+
+
+def department_week(dept_id, week_start):
+    return (
+        _in_week(TimetableSlot.objects.filter(dept_id=dept_id), week_start)
+        .select_related('teacher')
+        .only(*CELL_FIELDS, 'weekday', 'slot', 'teacher__username', 'teacher__first_name', 'teacher__last_name')
+        .order_by('weekday', 'slot', 'start_time')
+    )
+
+
+def week_grid(cells):
+    """
+    Lay ``cells`` out as {'days': [...], 'rows': [{'label', 'cells': [[cell, ...] per day]}]}.
+
+    Only days with classes get a column; rows run from the first to the
+    last occupied slot so gaps in the day stay visible.
+    """
+    cells = list(cells)
+    if not cells:
+        return {'days': [], 'rows': []}
+    days = sorted({cell.weekday for cell in cells})
+    column = {weekday: i for i, weekday in enumerate(days)}
+    first = min(cell.slot for cell in cells)
+    last = max(cell.slot for cell in cells)
+    rows = [
+        {'label': _label(slot * SLOT_MINUTES), 'cells': [[] for _ in days]}
+        for slot in range(first, last + 1)
+    ]
+    for cell in cells:
+        # Class details are shown in the slot it starts in only
+        cell.starts_here = cell.slot == _minutes(cell.start_time) // SLOT_MINUTES
+        rows[cell.slot - first]['cells'][column[cell.weekday]].append(cell)
+    return {'days': [WEEKDAYS[d].capitalize() for d in days], 'rows': rows}
@@ -20,8 +20,21 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from home import views as home_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('schedule/json/', home_views.schedule_json, name='schedule_json'),
+    path('api/timetable/', home_views.timetable_api, name='timetable_api'),
+    path('calendar/<str:kind>/<str:key>/<str:signature>.ics', home_views.calendar_feed, name='calendar_feed'),
+    path('metrics', home_views.metrics, name='metrics'),
+    path('rooms/free/', home_views.free_rooms, name='free_rooms'),
+    path('api/rooms/free/', home_views.free_rooms_api, name='free_rooms_api'),
+    path('api/substitutes/<str:dept_name>/', home_views.substitutes_api, name='substitutes_api'),
+    path('events/<int:dept_id>/', home_views.department_events, name='department_events'),
+    path('week/', home_views.teacher_week, name='my_week'),
+    path('week/teacher/<int:teacher_id>/', home_views.teacher_week, name='teacher_week'),
+    path('week/dept/<str:dept_name>/', home_views.department_week, name='department_week'),
     # Avoid multiple includes pointing to the same app unless necessary
     path('', include('home.urls')),
 ]
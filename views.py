@@ -1,4 +1,4 @@
-from django.shortcuts import render, redirect, HttpResponse
+from django.shortcuts import get_object_or_404, render, redirect, HttpResponse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login
 from django.contrib.auth.decorators import login_required
@@ -7,7 +7,21 @@ from django.utils.timezone import now
 from .forms import TeacherSignupForm, TeacherProfileForm
 from .models import Teacher, Dept, DepartmentCourse, Schedule, Meeting, LeaveRequest
 from .forms import MeetingForm
-from django.core.mail import send_mass_mail
+from django.core.exceptions import ValidationError
+from django.db import transaction
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_safe
+from .caching import get_stamp
+from .pagination import SCHEDULE_ORDERING, InvalidCursor, page_size_from, paginate_schedules
+from . import availability, dashboard, events, ical, search, substitutes, timetable
+from .mailer import queue_meeting_notice
+from .roster import ROSTER_CACHE_TIMEOUT, _dept_id, department_roster, with_row_versions
+from .metrics import REGISTRY
+from .occupancy import WEEKDAYS
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
 
 def contact(request):
     return render(request, 'contact.html')
@@ -22,50 +36,16 @@ def department_page(request):
 def department_detail(request, dept_name):
     query = request.GET.get('q', '')
 
-    try:
-        department = Dept.objects.get(name=dept_name.upper())
-    except Dept.DoesNotExist:
+    # Grouped per teacher and cached until the timetable changes
+    department_data = department_roster(dept_name.upper(), query)
+    if department_data is None:
         return HttpResponse("Department not found", status=404)
 
-    dept_courses = DepartmentCourse.objects.filter(dept=department)
-    course_semester_map = {dc.course: dc.semester for dc in dept_courses}
-
-    # Only use select_related on foreign key fields (teacher is okay)
-    schedules = Schedule.objects.filter(dept=department).select_related('teacher')
-
-    if query:
-        schedules = schedules.filter(
-            Q(teacher__username__icontains=query) |
-            Q(teacher__first_name__icontains=query) |
-            Q(teacher__last_name__icontains=query)
-        )
-
-    department_data = {}
-    for schedule in schedules:
-        teacher = schedule.teacher
-        course = schedule.course
-        semester = course_semester_map.get(course, "N/A")
-
-        if not teacher:
-            continue
-
-        if teacher.username not in department_data:
-            department_data[teacher.username] = {
-                'teacher': teacher,
-                'courses': [],
-            }
-
-        department_data[teacher.username]['courses'].append({
-            'name': course.name if hasattr(course, 'name') else str(course),
-            'semester': semester,
-        })
-
-    department_data = list(department_data.values())
-
-    return render(request, f'{dept_name.lower()}_department.html', {
-        'department_data': department_data,
+    return render(request, 'department_detail.html', {
+        'department_data': with_row_versions(department_data),
         'dept_name': dept_name.upper(),
-        'query': query
+        'query': query,
+        'fragment_timeout': ROSTER_CACHE_TIMEOUT,
     })
 
 
@@ -130,37 +110,169 @@ def department_detail(request, dept_name):
 from .models import Schedule, LeaveRequest
 from django.utils.timezone import now
 
-@login_required
-def schedule(request):
-    query = request.GET.get('q', '')
-
-    # Auto-delete leave requests after their date
-    LeaveRequest.objects.filter(date__lt=now().date()).delete()
-
+def _visible_schedules(query=''):
     schedules = Schedule.objects.select_related('teacher', 'dept').filter(
         Q(teacher__is_superuser=False) | Q(teacher__isnull=True)
     )
 
     if query:
+        # Full-text matches when the search index is available, so they
+        # page through paginate_schedules like the unfiltered list
+        matching = search.matching(search.SCHEDULE, query)
+        if matching is not None:
+            return schedules.filter(pk__in=matching)
         schedules = schedules.filter(
             Q(teacher__first_name__icontains=query) |
             Q(teacher__last_name__icontains=query) |
             Q(course__icontains=query) |
             Q(dept__name__icontains=query)
         )
+    return schedules
 
-    # Get approved leave requests for today
-    leave_today_teachers = LeaveRequest.objects.filter(
+
+def _teachers_on_leave_today(schedules):
+    # Only look up leave for the teachers shown on the current page
+    teacher_ids = {s.teacher_id for s in schedules if s.teacher_id}
+    if not teacher_ids:
+        return set()
+    return set(LeaveRequest.objects.filter(
         date=now().date(),
-        status='approved'
-    ).values_list('teacher_id', flat=True)
+        status='approved',
+        teacher_id__in=teacher_ids,
+    ).values_list('teacher_id', flat=True))
+
+
+def _events_dept_id(teacher):
+    """Pk of the teacher's department for its event stream, or None."""
+    return _dept_id(teacher.department.upper()) if teacher.department else None
+
+
+@login_required
+def schedule(request):
+    query = request.GET.get('q', '')
+    schedules = _visible_schedules(query)
+    page_size = page_size_from(request.GET.get('page_size'))
+    is_first_page = not request.GET.get('cursor')
+    try:
+        page, next_cursor = paginate_schedules(
+            schedules,
+            cursor=request.GET.get('cursor'),
+            page_size=page_size,
+        )
+    except InvalidCursor:
+        # Stale or hand-edited link: start again from the first page
+        page, next_cursor = paginate_schedules(schedules, page_size=page_size)
+        is_first_page = True
 
     return render(request, 'schedule.html', {
-        'schedules': schedules,
-        'leave_today_teachers': leave_today_teachers,
+        'schedules': page,
+        'leave_today_teachers': _teachers_on_leave_today(page),
         'query': query,
+        'next_cursor': next_cursor,
+        'page_size': page_size,
+        'is_first_page': is_first_page,
+        'events_dept_id': _events_dept_id(request.user),
     })
 
+
+@login_required
+def schedule_json(request):
+    query = request.GET.get('q', '')
+    try:
+        page, next_cursor = paginate_schedules(
+            _visible_schedules(query),
+            cursor=request.GET.get('cursor'),
+            page_size=page_size_from(request.GET.get('page_size')),
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    on_leave = _teachers_on_leave_today(page)
+    results = [
+        {
+            'id': s.id,
+            'course': s.course,
+            'teacher': (s.teacher.get_full_name() or s.teacher.username) if s.teacher else None,
+            'teacher_id': s.teacher_id,
+            'on_leave_today': s.teacher_id in on_leave,
+            'dept': s.dept.name if s.dept else None,
+            'day': s.day,
+            'date': s.date.isoformat() if s.date else None,
+            'start_time': s.start_time.strftime('%H:%M'),
+            'end_time': s.end_time.strftime('%H:%M'),
+            'room': s.room,
+        }
+        for s in page
+    ]
+    return JsonResponse({'results': results, 'next_cursor': next_cursor})
+
+
+TIMETABLE_FIELDS = (
+    'id', 'course', 'teacher__teacher_id', 'teacher__username', 'teacher__first_name', 'teacher__last_name',
+    'dept__name', 'day', 'date', 'start_time', 'end_time', 'room',
+)
+TIMETABLE_CHUNK_SIZE = 500
+
+
+def _timetable_stamp(request):
+    # Read once per request; both condition() callbacks need it
+    if not hasattr(request, '_timetable_stamp'):
+        request._timetable_stamp = get_stamp('timetable')
+    return request._timetable_stamp
+
+
+def _timetable_etag(request):
+    return str(_timetable_stamp(request)[0])
+
+
+def _timetable_last_modified(request):
+    return datetime.fromtimestamp(_timetable_stamp(request)[1], tz=dt_timezone.utc)
+
+
+def _stream_timetable(rows):
+    yield '{"results": ['
+    chunk = []
+    first = True
+    for (pk, course, teacher_id, username, first_name, last_name,
+         dept, day, date, start_time, end_time, room) in rows:
+        full_name = f'{first_name} {last_name}'.strip()
+        chunk.append(('' if first else ',') + json.dumps({
+            'id': pk,
+            'course': course,
+            'teacher': (full_name or username) if username else None,
+            'teacher_id': teacher_id,
+            'dept': dept,
+            'day': day,
+            'date': date.isoformat() if date else None,
+            'start_time': start_time.strftime('%H:%M'),
+            'end_time': end_time.strftime('%H:%M'),
+            'room': room,
+        }))
+        first = False
+        if len(chunk) >= TIMETABLE_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk) + ']}'
+
+
+@login_required
+@require_safe
+@condition(etag_func=_timetable_etag, last_modified_func=_timetable_last_modified)
+def timetable_api(request):
+    # Unchanged polls are answered with 304 by condition() before this runs
+    schedules = Schedule.objects.filter(Q(teacher__is_superuser=False) | Q(teacher__isnull=True))
+    if request.GET.get('dept'):
+        schedules = schedules.filter(dept__name=request.GET['dept'].upper())
+    if request.GET.get('teacher'):
+        schedules = schedules.filter(teacher__teacher_id=request.GET['teacher'])
+    if request.GET.get('day'):
+        schedules = schedules.filter(day__iexact=request.GET['day'].strip())
+
+    rows = schedules.order_by(*SCHEDULE_ORDERING).values_list(*TIMETABLE_FIELDS).iterator(
+        chunk_size=TIMETABLE_CHUNK_SIZE
+    )
+    return StreamingHttpResponse(_stream_timetable(rows), content_type='application/json')
+
 '''from .models import LeaveRequest
 
 @login_required
@@ -200,6 +312,47 @@ def teacher_list(request):
     return render(request, 'teacher_list.html', {'teachers': teachers})
 
 
+def _week_context(request):
+    # ?week= takes any date in the week; a missing or bad one shows this week
+    try:
+        day = date.fromisoformat(request.GET.get('week', ''))
+    except ValueError:
+        day = now().date()
+    week_start = day - timedelta(days=day.weekday())
+    return {
+        'week_start': week_start,
+        'previous_week': week_start - timedelta(days=7),
+        'next_week': week_start + timedelta(days=7),
+    }
+
+
+@login_required
+def teacher_week(request, teacher_id=None):
+    if teacher_id is None:
+        teacher = request.user
+    else:
+        teacher = get_object_or_404(Teacher, pk=teacher_id, is_superuser=False)
+    week = _week_context(request)
+    return render(request, 'week.html', {
+        'title': teacher.get_full_name() or teacher.username,
+        'grid': timetable.week_grid(timetable.teacher_week(teacher.pk, week['week_start'])),
+        'show_teacher': False,
+        **week,
+    })
+
+
+@login_required
+def department_week(request, dept_name):
+    dept = get_object_or_404(Dept, name=dept_name.upper())
+    week = _week_context(request)
+    return render(request, 'week.html', {
+        'title': f'{dept.name} Department',
+        'grid': timetable.week_grid(timetable.department_week(dept.pk, week['week_start'])),
+        'show_teacher': True,
+        **week,
+    })
+
+
 def signup(request):
     if request.method == 'POST':
         form = TeacherSignupForm(request.POST, request.FILES)
@@ -275,36 +428,20 @@ def index(request):
         messages.error(request, "Superusers are not allowed to log in.")
         return redirect('login')
 
-    # Auto-delete past meetings
-    Meeting.objects.filter(date__lt=now().date()).delete()
+    # Past meetings are removed by the purge_expired command, not here
 
-    # Get schedules and courses for the logged-in teacher
-    schedules = Schedule.objects.filter(teacher=teacher)
-    courses = schedules.values_list('course', flat=True).distinct()
+    # Schedules, courses and upcoming department meetings, cached until
+    # this teacher's schedules or their department's meetings change
+    snapshot = dashboard.teacher_dashboard(teacher)
 
-    # Upcoming meetings in same department (via created_by -> department)
-    upcoming_meetings = Meeting.objects.filter(
-        created_by__department=teacher.department,
-        date__gte=now().date()
-    ).order_by('date', 'time')
-
-    # Today's meeting
-    today_meeting = upcoming_meetings.filter(date=now().date()).first()
+    today_meeting = snapshot['today_meeting']
     if today_meeting:
         messages.info(
             request,
             f"You have a department meeting today at {today_meeting.venue} at {today_meeting.time}."
         )
 
-    context = {
-        'teacher': teacher,
-        'courses': courses,
-        'schedules': schedules,
-        'upcoming_meetings': upcoming_meetings,
-        'today_meeting': today_meeting,
-    }
-
-    return render(request, 'index.html', context)
+    return render(request, 'index.html', {'teacher': teacher, 'events_dept_id': _events_dept_id(teacher), **snapshot})
 
 
 
@@ -338,9 +475,14 @@ def profile_view(request):
     else:
         form = TeacherProfileForm(instance=teacher)
 
+    calendar_feeds = [('My timetable', ical.feed_url('teacher', teacher.pk))]
+    if Dept.objects.filter(name=teacher.department).exists():
+        calendar_feeds.append((f'{teacher.department} department', ical.feed_url('dept', teacher.department)))
+
     return render(request, 'profile.html', {
         'form': form,
         'teacher': teacher,
+        'calendar_feeds': [(label, request.build_absolute_uri(url)) for label, url in calendar_feeds],
     })
 
 
@@ -348,48 +490,33 @@ def profile_view(request):
 def create_meeting(request):
     teacher = request.user
 
-    # Auto-delete past meetings
-    Meeting.objects.filter(date__lt=now().date()).delete()
-
     if request.method == 'POST':
         date = request.POST.get('date')
         time = request.POST.get('time')
         venue = request.POST.get('venue')
 
         if date and time and venue:
-            meeting = Meeting.objects.create(
-                created_by=teacher,
-                date=date,
-                time=time,
-                venue=venue
-            )
-
-            # Get all teachers in the same department
-            dept_teachers = Teacher.objects.filter(department=teacher.department, is_superuser=False)
-
-            # Prepare subject and message
-            subject = f"Department Meeting Scheduled on {date}"
-            message = (
-                f"Dear Lecturer,\n\n"
-                f"A department meeting has been scheduled.\n\n"
-                f"📅 Date: {date}\n"
-                f"🕒 Time: {time}\n"
-                f"📍 Venue: {venue}\n"
-                f"👤 Scheduled by: {teacher.get_full_name() or teacher.username}\n\n"
-                f"Please be punctual.\n\nRegards,\nAdmin"
-            )
-
-            from_email = None  # Uses DEFAULT_FROM_EMAIL
-            recipient_list = [t.email for t in dept_teachers if t.email]
-
-            # Send to all valid emails
-            if recipient_list:
-                send_mass_mail([
-                    (subject, message, from_email, recipient_list)
-                ], fail_silently=False)
-
-            messages.success(request, 'Meeting created and email reminders sent.')
-            return redirect('create_meeting')
+            # The notices are queued in the same transaction as the meeting and
+            # delivered later by the send_outbox worker.
+            try:
+                # BEGIN IMMEDIATE holds the write lock from the check to the insert
+                with transaction.atomic():
+                    meeting = Meeting(
+                        created_by=teacher,
+                        date=date,
+                        time=time,
+                        venue=venue
+                    )
+                    meeting.full_clean()
+                    meeting.save()
+                    queue_meeting_notice(meeting)
+            except ValidationError as e:
+                # Bad date or time, or venue already taken by a class or another meeting
+                for error in e.messages:
+                    messages.error(request, error)
+            else:
+                messages.success(request, 'Meeting created and email reminders queued.')
+                return redirect('create_meeting')
         else:
             messages.error(request, "Please fill in all fields.")
 
@@ -476,3 +603,107 @@ def delete_account(request):
 def logout_view(request):
     logout(request)
     return redirect('login')  # Make sure 'login' is the name of your login URL
+
+
+def _calendar_etag(request, kind, key):
+    request._feed_etag = ical.feed_etag(kind, key)
+    return request._feed_etag
+
+
+@condition(etag_func=_calendar_etag)
+def _calendar_feed(request, kind, key):
+    # Unchanged feeds are answered with 304 by condition() before this runs
+    etag = request._feed_etag
+    body = ical.cached_feed(kind, key, etag)
+    if body is not None:
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    else:
+        source = ical.feed_source(kind, key)
+        if source is None:
+            raise Http404("No such calendar")
+        response = StreamingHttpResponse(
+            ical.caching_stream(kind, key, etag, ical.generate_feed(*source)),
+            content_type='text/calendar; charset=utf-8',
+        )
+    response['Content-Disposition'] = f'inline; filename="{kind}-{key}.ics"'
+    return response
+
+
+@require_safe
+def calendar_feed(request, kind, key, signature):
+    # No login: calendar apps authenticate with the signed URL instead
+    if not ical.valid_signature(kind, key, signature):
+        raise Http404("No such calendar")
+    return _calendar_feed(request, kind, key)
+
+
+@staff_member_required
+def free_rooms(request):
+    rooms, error = None, None
+    if request.GET.get('start'):
+        try:
+            start, end, weekday, on_date = availability.parse_window(request.GET)
+            rooms = availability.free_rooms(start, end, weekday, on_date)
+        except ValueError as e:
+            error = str(e)
+    return render(request, 'free_rooms.html', {
+        'rooms': rooms,
+        'error': error,
+        'params': request.GET,
+        'weekdays': [day.capitalize() for day in WEEKDAYS],
+    })
+
+
+@login_required
+@require_safe
+def free_rooms_api(request):
+    try:
+        start, end, weekday, on_date = availability.parse_window(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'start': start.strftime('%H:%M'),
+        'end': end.strftime('%H:%M'),
+        'date': on_date.isoformat() if on_date else None,
+        'day': WEEKDAYS[weekday].capitalize(),
+        'rooms': availability.free_rooms(start, end, weekday, on_date),
+    })
+
+
+@login_required
+@require_safe
+def substitutes_api(request, dept_name):
+    dept = get_object_or_404(Dept, name=dept_name.upper())
+    try:
+        on_date = date.fromisoformat(request.GET['date']) if request.GET.get('date') else now().date()
+    except ValueError:
+        return JsonResponse({'error': 'date must be YYYY-MM-DD'}, status=400)
+    return JsonResponse({
+        'dept': dept.name,
+        'date': on_date.isoformat(),
+        'slots': substitutes.substitute_suggestions(dept.name, on_date),
+    })
+
+
+@login_required
+@require_safe
+async def department_events(request, dept_id):
+    # Server-sent events; serve through asgi.py so idle streams hold no thread
+    if not isinstance(request, ASGIRequest):
+        # WSGI would buffer the endless stream; 204 tells EventSource to stop
+        return HttpResponse(status=204)
+    department = await Dept.objects.filter(pk=dept_id).values_list('name', flat=True).afirst()
+    if department is None:
+        raise Http404("Department not found")
+    department = department.upper()
+    last_event_id = request.headers.get('Last-Event-ID') or None
+    response = StreamingHttpResponse(events.stream(department, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass events through unbuffered
+    return response
+
+
+@staff_member_required
+def metrics(request):
+    # Prometheus text format; numbers are per worker process
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')